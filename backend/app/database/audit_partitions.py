@@ -0,0 +1,189 @@
+"""
+Monthly range partitions for audit_logs (PostgreSQL only).
+
+audit_logs is created PARTITION BY RANGE (timestamp). Each month gets its
+own partition, named audit_logs_yYYYYmMM, and created ahead of time. A
+DEFAULT partition catches rows outside every range, so inserts never fail.
+Retention detaches whole partitions instead of running DELETEs.
+"""
+import re
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+TABLE = "audit_logs"
+DEFAULT_PARTITION = f"{TABLE}_default"
+LEGACY_TABLE = f"{TABLE}_unpartitioned"
+
+_PARTITION_NAME = re.compile(rf"^{TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    years, month_index = divmod(value.month - 1 + months, 12)
+    return date(value.year + years, month_index + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def _current_month() -> date:
+    return month_start(datetime.now(timezone.utc).date())
+
+
+def _supported(engine: Engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def is_partitioned(conn) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table"
+    ), {"table": TABLE}).first() is not None
+
+
+def list_partitions(conn) -> List[Dict[str, Any]]:
+    """Attached partitions with their month (None for the default partition) and bound"""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "WHERE parent.relname = :table ORDER BY c.relname"
+    ), {"table": TABLE}).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _PARTITION_NAME.match(name)
+        partitions.append({
+            "name": name,
+            "month": date(int(match.group(1)), int(match.group(2)), 1) if match else None,
+            "bound": bound
+        })
+    return partitions
+
+
+def _create_month_partition(conn, month: date):
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF {TABLE} '
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+        f"TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+    ))
+
+
+def is_missing_partition_error(error: Exception) -> bool:
+    """True for PostgreSQL's error when no partition (and no default) accepts a row"""
+    return "no partition of relation" in str(error)
+
+
+def ensure_partitions(engine: Engine, months_ahead: int) -> List[str]:
+    """Create the default partition and monthly ones through months_ahead; returns new names"""
+    if not _supported(engine):
+        return []
+
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            print(f"{TABLE} is not partitioned; run python -m app.workers.audit_maintenance --migrate")
+            return []
+        existing = {partition["name"] for partition in list_partitions(conn)}
+
+    created = []
+    wanted = [(DEFAULT_PARTITION, None)] + [
+        (partition_name(add_months(_current_month(), i)), add_months(_current_month(), i))
+        for i in range(months_ahead + 1)
+    ]
+    for name, month in wanted:
+        if name in existing:
+            continue
+        # One transaction each, so a month the default partition already holds rows for doesn't block the rest
+        try:
+            with engine.begin() as conn:
+                if month is None:
+                    conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {TABLE} DEFAULT'))
+                else:
+                    _create_month_partition(conn, month)
+            created.append(name)
+        except Exception as e:
+            print(f"Could not create partition {name}: {e}")
+    return created
+
+
+def detach_expired_partitions(engine: Engine, retention_months: int, drop: bool = False) -> List[str]:
+    """
+    Detach monthly partitions that lie entirely before the retention window.
+    Detached tables are kept for archiving unless drop is set.
+    """
+    if not _supported(engine):
+        return []
+
+    cutoff = add_months(_current_month(), -retention_months)
+    detached = []
+    with engine.connect() as conn:
+        expired = [p["name"] for p in list_partitions(conn) if p["month"] is not None and p["month"] < cutoff]
+
+    for name in expired:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {TABLE} DETACH PARTITION "{name}"'))
+                if drop:
+                    conn.execute(text(f'DROP TABLE "{name}"'))
+            detached.append(name)
+        except Exception as e:
+            print(f"Could not detach partition {name}: {e}")
+    return detached
+
+
+def migrate_to_partitioned(engine: Engine, months_ahead: int) -> bool:
+    """
+    Convert an existing unpartitioned audit_logs. The old table is renamed to
+    audit_logs_unpartitioned, together with its indexes and id sequence. A
+    partitioned table with monthly partitions covering the old rows takes its
+    place, and the rows are copied across. The old table is left in place for
+    the operator to drop.
+    """
+    from app.models.document import AuditLog
+
+    if not _supported(engine):
+        return False
+
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT to_regclass(:table)"), {"table": TABLE}).scalar()
+        if exists is None or is_partitioned(conn):
+            return False
+
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": TABLE}).scalar()
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}"))
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {LEGACY_TABLE}_id_seq"))
+        indexes = conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = :table"
+        ), {"table": LEGACY_TABLE}).scalars().all()
+        for index in indexes:
+            conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index.replace(TABLE, LEGACY_TABLE, 1)[:63]}"'))
+
+        AuditLog.__table__.create(bind=conn)
+        conn.execute(text(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF {TABLE} DEFAULT'))
+
+        oldest = conn.execute(text(f"SELECT min(timestamp) FROM {LEGACY_TABLE}")).scalar()
+        month = month_start(oldest.date()) if oldest else _current_month()
+        last = add_months(_current_month(), months_ahead)
+        while month <= last:
+            _create_month_partition(conn, month)
+            month = add_months(month, 1)
+
+        columns = ", ".join(column.name for column in AuditLog.__table__.columns)
+        conn.execute(text(
+            f"INSERT INTO {TABLE} ({columns}) "
+            f"SELECT {columns} FROM {LEGACY_TABLE} WHERE timestamp IS NOT NULL"
+        ))
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), "
+            f"(SELECT coalesce(max(id), 0) + 1 FROM {TABLE}), false)"
+        ))
+    return True
@@ -0,0 +1,124 @@
+"""
+In-place upgrades for databases created before a column was added.
+
+Base.metadata.create_all only creates missing tables, so columns added to
+an existing table (documents.content_hash, documents.is_active) are added
+and backfilled here. upgrade_documents runs at API startup and is a no-op
+once the columns exist.
+
+The LanceDB chunk table changed shape at the same time: row ids became
+strings from VectorStoreManager.make_chunk_id and every row carries a
+content_hash. Older tables can't be merged into, so they are rebuilt:
+
+    python -m app.database.schema_upgrades --rebuild-vectors
+
+drops the chunk table and its index state, then queues every active
+document for ingestion again. Search returns nothing for a document until
+the worker has re-processed it.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+from typing import List
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Engine
+
+TABLE = "documents"
+
+
+def _file_hash(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def upgrade_documents(engine: Engine) -> List[str]:
+    """Add and backfill the document columns an older table lacks; returns the columns added"""
+    columns = {column["name"] for column in inspect(engine).get_columns(TABLE)}
+    added = []
+
+    with engine.begin() as conn:
+        if "is_active" not in columns:
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN is_active BOOLEAN DEFAULT TRUE"))
+            # A document some newer version points back to has been superseded
+            conn.execute(text(
+                f"UPDATE {TABLE} SET is_active = (id NOT IN "
+                f"(SELECT previous_version_id FROM {TABLE} WHERE previous_version_id IS NOT NULL))"
+            ))
+            added.append("is_active")
+
+        if "content_hash" not in columns:
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN content_hash VARCHAR(64)"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{TABLE}_content_hash ON {TABLE} (content_hash)"))
+            rows = conn.execute(text(f"SELECT id, file_path FROM {TABLE}")).all()
+            for document_id, file_path in rows:
+                # Files already cleaned up just miss duplicate detection
+                if file_path and os.path.exists(file_path):
+                    conn.execute(text(f"UPDATE {TABLE} SET content_hash = :hash WHERE id = :id"),
+                                 {"hash": _file_hash(file_path), "id": document_id})
+            added.append("content_hash")
+
+    return added
+
+
+async def requeue_active_documents(requested_by: str) -> int:
+    """Queue an ingestion job for every active document"""
+    from app.database.session import AsyncSessionLocal
+    from app.models.document import Document
+    from app.services.ingestion import enqueue_ingestion
+
+    async with AsyncSessionLocal() as db:
+        documents = (await db.execute(
+            select(Document).where(Document.is_active.isnot(False))
+        )).scalars().all()
+        for document in documents:
+            document.is_processed = False
+            document.processing_error = None
+            await enqueue_ingestion(db, document.id, document.file_path, {
+                "source": document.source,
+                "document_type": document.document_type,
+                "uploaded_by": requested_by,
+                "document_id": document.id
+            })
+        await db.commit()
+    return len(documents)
+
+
+def rebuild_vector_store(requested_by: str = "system") -> int:
+    """Drop the LanceDB chunk table and re-ingest every active document; returns the jobs queued"""
+    from app.database.session import SessionLocal
+    from app.models.document import SectionReference
+    from app.services.corpus_version import section_index_version
+    from app.services.vector_store import get_vector_store
+
+    get_vector_store().reset()
+    # Section references point at the dropped chunk ids
+    with SessionLocal() as db:
+        db.query(SectionReference).delete(synchronize_session=False)
+        db.commit()
+    section_index_version.bump()
+    return asyncio.run(requeue_active_documents(requested_by))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upgrade tables created by an older release")
+    parser.add_argument("--rebuild-vectors", action="store_true",
+                        help="drop the LanceDB chunk table and re-ingest every active document")
+    args = parser.parse_args()
+
+    from app.database.session import engine, Base
+    import app.models.document  # noqa: F401 (registers the tables)
+
+    Base.metadata.create_all(bind=engine)
+    added = upgrade_documents(engine)
+    print(f"Document columns added: {', '.join(added) or 'none'}")
+    if args.rebuild_vectors:
+        print(f"Vector store dropped; {rebuild_vector_store()} documents queued for ingestion")
+
+
+if __name__ == "__main__":
+    main()
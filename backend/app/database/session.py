@@ -1,9 +1,22 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
-# Create database engine
+# Async drivers for the request path, by backend
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def to_async_url(url: str) -> str:
+    """postgresql://... -> postgresql+asyncpg://... (other backends keep their URL)"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+# Create database engine (sync: ingestion workers, background threads, offline jobs)
 engine = create_engine(
     settings.DATABASE_URL,
     pool_size=20,
@@ -15,6 +28,20 @@ engine = create_engine(
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for request handlers, so queries don't block the event loop
+async_url = settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+# aiosqlite (local testing) gets a pool that takes no size arguments
+async_pool_args = {} if make_url(async_url).get_backend_name() == "sqlite" else {"pool_size": 20, "max_overflow": 30}
+async_engine = create_async_engine(
+    async_url,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    **async_pool_args
+)
+
+# expire_on_commit=False: handlers read attributes after commit without another round-trip
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Create Base class
 Base = declarative_base()
 
@@ -24,4 +51,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -5,12 +5,17 @@ from contextlib import asynccontextmanager
 import os
 
 from datetime import datetime
-from app.database.session import engine, Base, get_db
+from app.database.session import engine, async_engine, Base
+from app.database import audit_partitions, schema_upgrades
 from app.routes import chat, admin, auth
 from app.config import settings
+from app.services import embedding_registry
+from app.services.inference_executor import inference_executor
+from app.utils.audit_logger import audit_writer
 
-# Create tables
+# Create tables, and add columns that tables from an older release lack
 Base.metadata.create_all(bind=engine)
+schema_upgrades.upgrade_documents(engine)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -19,9 +24,19 @@ async def lifespan(app: FastAPI):
     # Create necessary directories
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
     os.makedirs(settings.VECTOR_STORE_PATH, exist_ok=True)
+    # Audit rows need a partition for the current month (and a few ahead)
+    audit_partitions.ensure_partitions(engine, settings.AUDIT_PARTITION_MONTHS_AHEAD)
+    # Load the shared embedding model once so the first query doesn't pay for it
+    print(f"Warming up embedding model {settings.EMBEDDING_MODEL}...")
+    embedding_registry.warmup()
     yield
     # Shutdown
     print("Shutting down...")
+    inference_executor.shutdown()
+    auth.password_executor.shutdown()
+    # Write out audit events still in the queue
+    audit_writer.close()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Government Cyber Law Chatbot API",
@@ -51,7 +66,11 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.utcnow(),
+        "embedding_model": embedding_registry.status()
+    }
 
 if __name__ == "__main__":
     import uvicorn
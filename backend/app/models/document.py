@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, JSON, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database.session import Base
@@ -13,6 +14,7 @@ class Document(Base):
     title = Column(String(500), nullable=False)
     summary = Column(Text)
     total_pages = Column(Integer)
+    content_hash = Column(String(64), index=True)  # SHA-256 of the uploaded file
     
     # Metadata
     source = Column(String(255))  # e.g., "IT Act 2000"
@@ -26,6 +28,7 @@ class Document(Base):
     
     # Versioning
     version = Column(Integer, default=1)
+    is_active = Column(Boolean, default=True)  # False once superseded or retired
     previous_version_id = Column(Integer, ForeignKey('documents.id'), nullable=True)
     
     # Audit
@@ -55,18 +58,56 @@ class DocumentChunk(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # On PostgreSQL the table is range-partitioned by month on timestamp
+    # (see app/database/audit_partitions.py), so timestamp is part of the key
+    __table_args__ = (
+        Index("ix_audit_logs_action_timestamp", "action", "timestamp", "id"),
+        Index("ix_audit_logs_user_action_timestamp", "user_id", "action", "timestamp", "id"),
+        {"postgresql_partition_by": "RANGE (timestamp)"}
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     document_id = Column(Integer, ForeignKey('documents.id'), nullable=True)
     user_id = Column(String(100), nullable=False)
     action = Column(String(100), nullable=False)  # CREATE, UPDATE, DELETE, VIEW
     details = Column(JSON)
     ip_address = Column(String(45))
     user_agent = Column(Text)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     
     document = relationship("Document", back_populates="audit_logs")
 
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    # History reads are one range scan: a user's newest messages first
+    __table_args__ = (
+        Index("ix_chat_messages_user_timestamp", "user_id", "timestamp", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String(100), nullable=False)
+    query = Column(Text, nullable=False)
+    intent = Column(String(50))
+    intent_similarity = Column(Float)
+    confidence = Column(Float)
+    source_ids = Column(JSON().with_variant(ARRAY(String(255)), "postgresql"))  # chunk ids cited in the answer
+    response_length = Column(Integer)
+    channel = Column(String(20), default="query")  # query, batch or stream
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class SectionReference(Base):
+    __tablename__ = "section_references"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    act = Column(String(100), nullable=False, default="")  # normalized, e.g. "it act"; "" when unknown
+    section_number = Column(String(20), nullable=False)  # normalized, e.g. "43a"
+    document_id = Column(Integer, ForeignKey('documents.id'), nullable=False, index=True)
+    chunk_id = Column(String(255), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_section_references_act_section", "act", "section_number"),
+    )
+
 class User(Base):
     __tablename__ = "users"
     
@@ -79,4 +120,31 @@ class User(Base):
     role = Column(String(50), default="user")  # admin, editor, viewer
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    last_login = Column(DateTime(timezone=True))
\ No newline at end of file
+    last_login = Column(DateTime(timezone=True))
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey('documents.id'), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    payload = Column(JSON)  # file_path and chunk metadata
+    
+    # Retry bookkeeping
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), server_default=func.now())
+    last_error = Column(Text)
+    
+    # Claim bookkeeping (a stale lock means the worker died mid-job)
+    locked_by = Column(String(100))
+    locked_at = Column(DateTime(timezone=True))
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+    
+    document = relationship("Document")
+    
+    __table_args__ = (
+        Index("ix_ingestion_jobs_status_run_after", "status", "run_after"),
+    )
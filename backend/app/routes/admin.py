@@ -1,18 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
-import shutil
 from typing import List
 import uuid
 from datetime import datetime
 
-from app.database.session import get_db
-from app.models.document import Document, AuditLog, User
-from app.services.pdf_processor import PDFProcessor
+from app.database.session import get_async_db
+from app.database import audit_partitions
+from app.models.document import Document, AuditLog, User, IngestionJob
+from app.services.ingestion import enqueue_ingestion, requeue_failed_documents, find_duplicate_document, job_to_dict
+from app.services.corpus_version import corpus_version
+from app.services.vector_store import get_vector_store
+from app.services.section_index import delete_section_references
+from app.services.principal_cache import invalidate_principals
 from app.utils.audit_logger import AuditLogger
-from app.utils.validators import validate_file, validate_document
+from app.utils.validators import validate_document
+from app.utils.upload_stream import stream_upload, UploadRejected
+from app.utils import metrics
+from app.utils.pagination import keyset_page
 from app.config import settings
 
 from app.routes.auth import get_current_user, get_current_active_user
@@ -21,92 +29,151 @@ from app.routes.auth import get_current_user, get_current_active_user
 router = APIRouter(prefix="/admin", tags=["admin"])
 audit_logger = AuditLogger()
 
+USER_ROLES = ["admin", "editor", "viewer", "user"]
+
 # Document locking mechanism for concurrent edits
 document_locks = {}
 
-@router.post("/upload")
+# The upload body is parsed by hand (see upload_stream), so describe it for the docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+@router.post("/upload", openapi_extra=UPLOAD_REQUEST_BODY)
 async def upload_document(
-    file: UploadFile = File(...),
+    request: Request,
     source: str = "",
     document_type: str = "cyber_law",
-    background_tasks: BackgroundTasks = None,
-    db: Session = Depends(get_db),
+    previous_version_id: int = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Upload and process document with atomic transaction"""
+    """
+    Upload and process document with atomic transaction.
+    Pass previous_version_id to upload a new version of an existing document.
+    """
     
     # Validate user role
     if current_user.role not in ["admin", "editor"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    # Validate file
-    validation_result = validate_file(file, settings.MAX_FILE_SIZE, settings.ALLOWED_EXTENSIONS)
-    if not validation_result["valid"]:
-        raise HTTPException(status_code=400, detail=validation_result["message"])
+    # Stream the file to a temporary path, validating and hashing it on the way
+    try:
+        upload = await stream_upload(
+            request,
+            settings.UPLOAD_DIR,
+            settings.MAX_FILE_SIZE,
+            settings.ALLOWED_EXTENSIONS,
+            settings.UPLOAD_CHUNK_SIZE
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    
+    temp_path = upload.path
+    content_hash = upload.content_hash
+    # Generate unique filename
+    file_extension = os.path.splitext(upload.filename)[1]
+    unique_filename = f"{uuid.uuid4()}{file_extension}"
+    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
     
     # Create transaction for atomic operation
     try:
-        # Generate unique filename
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+        # Identical content is already (being) ingested; don't embed it again
+        duplicate = await find_duplicate_document(db, content_hash)
+        if duplicate:
+            os.remove(temp_path)
+            audit_logger.log(
+                user_id=current_user.username,
+                action="UPLOAD_DUPLICATE",
+                document_id=duplicate.id,
+                details={"filename": upload.filename, "content_hash": content_hash}
+            )
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "message": "An identical document already exists. Processing skipped.",
+                    "document_id": duplicate.id,
+                    "duplicate": True,
+                    "filename": upload.filename
+                }
+            )
+        
+        previous = None
+        if previous_version_id is not None:
+            previous = await db.get(Document, previous_version_id)
+            if not previous:
+                os.remove(temp_path)
+                raise HTTPException(status_code=404, detail="Previous version not found")
         
-        # Save file atomically
-        temp_path = file_path + ".tmp"
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
         os.rename(temp_path, file_path)
         
         # Create document record
         db_document = Document(
-            filename=file.filename,
+            filename=upload.filename,
             file_path=file_path,
             document_type=document_type,
-            title=file.filename,
-            source=source,
+            title=previous.title if previous else upload.filename,
+            source=source or (previous.source if previous else ""),
+            content_hash=content_hash,
+            version=previous.version + 1 if previous else 1,
+            previous_version_id=previous.id if previous else None,
             uploaded_by=current_user.username,
             is_processed=False
         )
         
         db.add(db_document)
-        db.flush()  # Get ID without committing
+        await db.flush()  # Get ID without committing
         
         # Log audit
         audit_logger.log(
             user_id=current_user.username,
             action="UPLOAD",
             document_id=db_document.id,
-            details={"filename": file.filename, "source": source}
+            details={"filename": upload.filename, "source": source}
         )
         
-        # Process in background
-        if background_tasks:
-            background_tasks.add_task(
-                process_document_background,
-                db_document.id,
-                file_path,
-                {
-                    "source": source,
-                    "document_type": document_type,
-                    "uploaded_by": current_user.username,
-                    "document_id": db_document.id
-                }
-            )
+        # Queue processing in the same transaction so the job can't be lost
+        job = await enqueue_ingestion(
+            db,
+            db_document.id,
+            file_path,
+            {
+                "source": source,
+                "document_type": document_type,
+                "uploaded_by": current_user.username,
+                "document_id": db_document.id
+            },
+            previous_document_id=db_document.previous_version_id
+        )
         
         # Commit transaction
-        db.commit()
+        await db.commit()
         
         return JSONResponse(
             status_code=200,
             content={
-                "message": "Document uploaded successfully. Processing started.",
+                "message": "Document uploaded successfully. Processing queued.",
                 "document_id": db_document.id,
-                "filename": file.filename
+                "job_id": job.id,
+                "filename": upload.filename
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         # Cleanup file if document creation failed
         if os.path.exists(temp_path):
             os.remove(temp_path)
@@ -115,45 +182,11 @@ async def upload_document(
         
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-async def process_document_background(document_id: int, file_path: str, metadata: dict):
-    """Background task for document processing"""
-    from app.database.session import SessionLocal
-    db = SessionLocal()
-    
-    try:
-        # Process PDF
-        processor = PDFProcessor(settings)
-        result = processor.process_document(file_path, metadata)
-        
-        # Update document status
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if document:
-            if result["success"]:
-                document.is_processed = True
-                document.total_pages = result.get("total_chunks", 0)
-                document.summary = f"Processed {result['total_sections']} sections"
-            else:
-                document.processing_error = result.get("error", "Unknown error")
-            
-            db.commit()
-            
-            # Log completion
-            audit_logger.log(
-                user_id=metadata["uploaded_by"],
-                action="PROCESS_COMPLETE" if result["success"] else "PROCESS_FAILED",
-                document_id=document_id,
-                details=result
-            )
-    except Exception as e:
-        print(f"Background processing error: {e}")
-    finally:
-        db.close()
-
 @router.put("/document/{document_id}")
 async def update_document(
     document_id: int,
     updates: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update document with optimistic concurrency control"""
@@ -165,7 +198,7 @@ async def update_document(
     # Implement optimistic locking
     try:
         # Get document with lock check
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await db.get(Document, document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
@@ -184,6 +217,7 @@ async def update_document(
             title=updates.get("title", document.title),
             summary=updates.get("summary", document.summary),
             source=updates.get("source", document.source),
+            content_hash=document.content_hash,
             previous_version_id=document.id,
             version=document.version + 1,
             uploaded_by=current_user.username,
@@ -191,11 +225,25 @@ async def update_document(
         )
         
         db.add(new_version)
-        db.flush()
+        await db.flush()
         
         # Archive old version
         document.is_active = False
         
+        # Re-ingest under the new version; unchanged chunks reuse the old vectors
+        job = await enqueue_ingestion(
+            db,
+            new_version.id,
+            new_version.file_path,
+            {
+                "source": new_version.source,
+                "document_type": new_version.document_type,
+                "uploaded_by": current_user.username,
+                "document_id": new_version.id
+            },
+            previous_document_id=document.id
+        )
+        
         # Log audit
         audit_logger.log(
             user_id=current_user.username,
@@ -208,45 +256,88 @@ async def update_document(
             }
         )
         
-        db.commit()
+        await db.commit()
+        corpus_version.bump()
         
         return {
             "message": "Document updated successfully",
             "new_document_id": new_version.id,
-            "version": new_version.version
+            "version": new_version.version,
+            "job_id": job.id
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Update failed: {str(e)}")
 
+@router.delete("/document/{document_id}")
+async def retire_document(
+    document_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Remove a document's chunks from search and mark it inactive (the record is kept for audit)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    document = await db.get(Document, document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    try:
+        vector_store = get_vector_store()
+        await run_in_threadpool(vector_store.delete_document, document_id)
+        # An ingestion worker rebuilds the BM25 index; it's too slow to run in the web process
+        vector_store.index_manager.mark_lexical_stale()
+        await db.run_sync(delete_section_references, document_id)
+        document.is_active = False
+        await db.commit()
+        corpus_version.bump()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
+    
+    audit_logger.log(
+        user_id=current_user.username,
+        action="DELETE",
+        document_id=document_id,
+        details={"filename": document.filename, "version": document.version}
+    )
+    
+    return {"message": "Document removed from search", "document_id": document_id}
+
 @router.get("/audit-logs")
 async def get_audit_logs(
     start_date: datetime = None,
     end_date: datetime = None,
     user_id: str = None,
     action: str = None,
-    db: Session = Depends(get_db),
+    limit: int = 100,
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get audit logs with filters"""
+    """Get audit logs with filters, newest first; pass next_cursor back as cursor for the next page"""
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    query = db.query(AuditLog)
+    statement = select(AuditLog)
     
     if start_date:
-        query = query.filter(AuditLog.timestamp >= start_date)
+        statement = statement.where(AuditLog.timestamp >= start_date)
     if end_date:
-        query = query.filter(AuditLog.timestamp <= end_date)
+        statement = statement.where(AuditLog.timestamp <= end_date)
     if user_id:
-        query = query.filter(AuditLog.user_id == user_id)
+        statement = statement.where(AuditLog.user_id == user_id)
     if action:
-        query = query.filter(AuditLog.action == action)
+        statement = statement.where(AuditLog.action == action)
     
-    logs = query.order_by(AuditLog.timestamp.desc()).limit(100).all()
+    try:
+        logs, next_cursor = await keyset_page(db, statement, AuditLog.timestamp, AuditLog.id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "logs": [
@@ -259,5 +350,160 @@ async def get_audit_logs(
                 "ip_address": log.ip_address
             }
             for log in logs
-        ]
+        ],
+        "next_cursor": next_cursor
     }
+
+@router.get("/audit-logs/partitions")
+async def get_audit_log_partitions(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Monthly audit_logs partitions currently attached (PostgreSQL only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if db.bind.dialect.name != "postgresql":
+        return {"partitioned": False, "partitions": []}
+    
+    def read_partitions(session):
+        return audit_partitions.is_partitioned(session), audit_partitions.list_partitions(session)
+    
+    partitioned, partitions = await db.run_sync(read_partitions)
+    return {
+        "partitioned": partitioned,
+        "partitions": partitions,
+        "retention_months": settings.AUDIT_RETENTION_MONTHS
+    }
+
+@router.get("/jobs")
+async def list_jobs(
+    status: str = None,
+    document_id: int = None,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List ingestion jobs, newest first"""
+    if current_user.role not in ["admin", "editor"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    statement = select(IngestionJob)
+    if status:
+        statement = statement.where(IngestionJob.status == status)
+    if document_id:
+        statement = statement.where(IngestionJob.document_id == document_id)
+    
+    statement = statement.order_by(IngestionJob.id.desc()).limit(min(limit, 500))
+    jobs = (await db.execute(statement)).scalars().all()
+    return {"jobs": [job_to_dict(job) for job in jobs]}
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the status of one ingestion job"""
+    if current_user.role not in ["admin", "editor"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    
+    job = await db.get(IngestionJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+@router.post("/jobs/retry-failed")
+async def retry_failed_documents(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Re-queue every document whose processing failed"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        requeued = await requeue_failed_documents(db, current_user.username)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Retry failed: {str(e)}")
+    
+    audit_logger.log(
+        user_id=current_user.username,
+        action="RETRY_FAILED_DOCUMENTS",
+        details={"requeued": requeued}
+    )
+    return {"message": f"Re-queued {requeued} documents", "requeued": requeued}
+
+@router.get("/vector-index")
+async def get_vector_index_status(
+    sample_size: int = 20,
+    k: int = 10,
+    current_user: User = Depends(get_current_user)
+):
+    """Index status plus recall@k measured against exact search on a random sample"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    index_manager = get_vector_store().index_manager
+    status = await run_in_threadpool(index_manager.status)
+    if sample_size > 0:
+        status["recall"] = await run_in_threadpool(index_manager.measure_recall, min(sample_size, 200), k)
+    return status
+
+@router.post("/vector-index/rebuild")
+async def rebuild_vector_index(current_user: User = Depends(get_current_user)):
+    """Queue a rebuild of the vector index; the next idle ingestion worker runs it"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    await run_in_threadpool(get_vector_store().index_manager.request_build)
+    audit_logger.log(user_id=current_user.username, action="VECTOR_INDEX_REBUILD", details={"queued": True})
+    return {"queued": True}
+
+@router.put("/users/{username}")
+async def update_user(
+    username: str,
+    user_data: dict,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Change a user's role or active flag"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    user = (await db.execute(select(User).where(User.username == username))).scalars().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    changes = {}
+    if "role" in user_data:
+        if user_data["role"] not in USER_ROLES:
+            raise HTTPException(status_code=400, detail=f"Role must be one of {', '.join(USER_ROLES)}")
+        changes["role"] = user_data["role"]
+    if "is_active" in user_data:
+        changes["is_active"] = bool(user_data["is_active"])
+    if not changes:
+        raise HTTPException(status_code=400, detail="Nothing to update (role, is_active)")
+    
+    for field, value in changes.items():
+        setattr(user, field, value)
+    await db.commit()
+    # Cached copies of this user would otherwise keep the old role until they expire
+    invalidate_principals()
+    
+    audit_logger.log(
+        user_id=current_user.username,
+        action="USER_UPDATE",
+        details={"username": username, **changes}
+    )
+    
+    return {"username": user.username, "role": user.role, "is_active": user.is_active}
+
+@router.get("/metrics")
+async def get_metrics(current_user: User = Depends(get_current_user)):
+    """Cache, queue and pipeline counters from this worker"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {"pid": os.getpid(), "metrics": metrics.snapshot()}
@@ -2,13 +2,17 @@ from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
-from app.database.session import get_db
+from app.database.session import get_async_db
 from app.models.document import User
 from app.config import settings
+from app.services.principal_cache import principal_cache, principal_version
+from app.services.inference_executor import InferenceExecutor, InferenceQueueFull
+from app.utils import metrics
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -16,17 +20,27 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt takes ~200 ms of CPU per call, so it runs on its own small pool; the
+# bounded queue caps concurrent logins so a burst can't starve chat inference
+password_executor = InferenceExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.LOGIN_MAX_QUEUE,
+    retry_after=settings.LOGIN_RETRY_AFTER_SECONDS,
+    name="password-hash"
+)
+metrics.register("password_hashing", password_executor.stats)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_password(plain_password, hashed_password):
+    return await password_executor.run(pwd_context.verify, plain_password, hashed_password)
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
+async def get_password_hash(password):
+    return await password_executor.run(pwd_context.hash, password)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = (await db.execute(select(User).where(User.username == username))).scalars().first()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
     return user
 
@@ -40,7 +54,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,9 +68,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    # The signature ties the entry to this token, so a reissued token is looked up afresh
+    cache_key = (username, token.rsplit(".", 1)[-1])
+    use_cache = settings.PRINCIPAL_CACHE_TTL_SECONDS > 0
+    if use_cache:
+        version = principal_version.current()
+        user = principal_cache.get_versioned(cache_key, version)
+        if user is not None:
+            return user
+    
+    user = (await db.execute(select(User).where(User.username == username))).scalars().first()
     if user is None:
         raise credentials_exception
+    if use_cache:
+        # Detached, so the request's own commits can't expire the shared copy
+        db.expunge(user)
+        principal_cache.set_versioned(cache_key, version, user)
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
@@ -67,9 +94,16 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 @router.post("/login")
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except InferenceQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -79,7 +113,7 @@ async def login(
     
     # Update last login
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
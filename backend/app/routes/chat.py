@@ -1,14 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Dict, Any
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, AsyncIterator, List, Tuple
+import asyncio
 import json
+import threading
 
-from app.database.session import get_db
-from app.services.rag_service import HybridRAGService
+from app.database.session import get_async_db
+from app.services.rag_service import HybridRAGService, QueryCancelled
+from app.services.inference_executor import inference_executor, InferenceQueueFull
 from app.utils.audit_logger import AuditLogger
 from app.config import settings
 from app.routes.auth import get_current_user
-from app.models.document import User, AuditLog
+from app.models.document import User, ChatMessage
+from app.utils.pagination import keyset_page
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 rag_service = HybridRAGService(settings)
@@ -17,7 +23,7 @@ audit_logger = AuditLogger()
 @router.post("/query")
 async def query_chatbot(
     query_data: Dict[str, Any],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -28,24 +34,29 @@ async def query_chatbot(
         if not query:
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
-        # Get response from RAG service
-        response = rag_service.query(query)
+        # Get response from RAG service without blocking the event loop
+        try:
+            response = await inference_executor.run(rag_service.query, query)
+        except InferenceQueueFull as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": str(e.retry_after)}
+            )
         
         # Log the query and response (without sensitive info)
         audit_logger.log(
             user_id=current_user.username if current_user else "anonymous",
             action="CHAT_QUERY",
             document_id=None,
-            details={
-                "query": query[:500],  # Limit length
-                "intent": response.get("intent", "unknown"),
-                "confidence": response.get("confidence", 0),
-                "response_length": len(response.get("answer", ""))
-            }
+            details=_chat_audit_details(query, response)
         )
+        audit_logger.log_chat_message(current_user.username if current_user else "anonymous", query, response)
         
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         audit_logger.log(
             user_id=current_user.username if current_user else "anonymous",
@@ -54,36 +65,272 @@ async def query_chatbot(
         )
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def _chat_audit_details(query: str, response: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "query": query[:500],  # Limit length
+        "intent": response.get("intent", "unknown"),
+        "confidence": response.get("confidence", 0),
+        "response_length": len(response.get("answer", ""))
+    }
+
+class _BatchSlice:
+    """One slice of a batch admitted to the inference pool; answers arrive on a queue as they finish"""
+    
+    def __init__(self, chunk: List[Tuple[int, Any]], cancelled: threading.Event):
+        self.invalid = []
+        self.valid = []
+        for position, query in chunk:
+            if isinstance(query, str) and query.strip():
+                self.valid.append((position, query.strip()))
+            else:
+                self.invalid.append(position)
+        
+        self.answers = asyncio.Queue()
+        self.pending = None
+        if self.valid:
+            loop = asyncio.get_running_loop()
+            queries = [query for _, query in self.valid]
+            
+            def run():
+                # Each answer is handed to the event loop as soon as it is ready
+                try:
+                    for item in rag_service.query_batch(queries, cancelled=cancelled):
+                        loop.call_soon_threadsafe(self.answers.put_nowait, item)
+                except Exception as e:
+                    loop.call_soon_threadsafe(self.answers.put_nowait, e)
+                finally:
+                    loop.call_soon_threadsafe(self.answers.put_nowait, None)
+            
+            # Raises InferenceQueueFull when there is no room
+            self.pending = inference_executor.submit(run)
+            # A job cancelled before it started never sends its end marker
+            self.pending.add_done_callback(lambda f: self.answers.put_nowait(None) if f.cancelled() else None)
+    
+    async def lines(self, user_id: str) -> AsyncIterator[str]:
+        """NDJSON lines for the slice, each written as soon as its answer is ready"""
+        for position in self.invalid:
+            yield json.dumps({"index": position, "error": "Query cannot be empty"})
+        if self.pending is None:
+            return
+        
+        answered = set()
+        audit_entries = []
+        try:
+            while True:
+                item = await self.answers.get()
+                if item is None or isinstance(item, QueryCancelled):
+                    break
+                if isinstance(item, Exception):
+                    audit_logger.log(
+                        user_id=user_id,
+                        action="CHAT_ERROR",
+                        details={"error": str(item), "batch_size": len(self.valid)}
+                    )
+                    for local_position, (position, _) in enumerate(self.valid):
+                        if local_position not in answered:
+                            yield json.dumps({"index": position, "error": "Internal server error"})
+                    break
+                
+                local_position, response = item
+                answered.add(local_position)
+                position, query = self.valid[local_position]
+                audit_entries.append({
+                    "user_id": user_id,
+                    "action": "CHAT_QUERY",
+                    "details": {**_chat_audit_details(query, response), "batch": True}
+                })
+                audit_logger.log_chat_message(user_id, query, response, channel="batch")
+                yield json.dumps({"index": position, "query": query, **response}, default=str)
+        finally:
+            audit_logger.log_many(audit_entries)
+    
+    def cancel(self):
+        if self.pending is not None and not self.pending.done():
+            self.pending.cancel()
+
+@router.post("/batch_query")
+async def batch_query_chatbot(
+    query_data: Dict[str, Any],
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Answer a list of queries, streaming one NDJSON line per answer.
+    
+    Queries are answered in slices of BATCH_QUERY_CHUNK_SIZE, each embedded in
+    one call; every answer is written as soon as it is ready. Every line
+    carries the query's position in the request as "index", and the stream
+    ends with a {"done": true} line. No further slices are started once the
+    client disconnects.
+    """
+    queries = query_data.get("queries")
+    if not isinstance(queries, list) or not queries:
+        raise HTTPException(status_code=400, detail="queries must be a non-empty list")
+    if len(queries) > settings.BATCH_QUERY_MAX_QUERIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BATCH_QUERY_MAX_QUERIES} queries per batch"
+        )
+    
+    user_id = current_user.username if current_user else "anonymous"
+    indexed = list(enumerate(queries))
+    size = settings.BATCH_QUERY_CHUNK_SIZE
+    chunks = [indexed[i:i + size] for i in range(0, len(indexed), size)]
+    cancelled = threading.Event()
+    
+    # The first slice is admitted before the response starts, so a full queue is still a plain 503
+    try:
+        first_slice = _BatchSlice(chunks[0], cancelled)
+    except InferenceQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    async def stream():
+        current = first_slice
+        try:
+            for number, chunk in enumerate(chunks):
+                if number > 0:
+                    # Mid-stream, a full queue means waiting for room rather than failing the batch
+                    while True:
+                        try:
+                            current = _BatchSlice(chunk, cancelled)
+                            break
+                        except InferenceQueueFull as e:
+                            await asyncio.sleep(e.retry_after)
+                async for line in current.lines(user_id):
+                    yield line + "\n"
+            yield json.dumps({"done": True, "count": len(queries)}) + "\n"
+        finally:
+            # On disconnect: stop the running slice at its next query and start no more
+            cancelled.set()
+            current.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/stream")
+async def stream_chatbot(
+    query_data: Dict[str, Any],
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Answer a query as Server-Sent Events: 'sources' (intent and citations) as
+    soon as retrieval finishes, then 'answer' events carrying the answer text,
+    then 'done' with confidence and timings. If the client disconnects, the
+    query stops at its next stage and frees its inference slot.
+    """
+    query = query_data.get("query", "").strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
+    user_id = current_user.username if current_user else "anonymous"
+    cancelled = threading.Event()
+    # Admission happens now, so a full queue is still a plain 503
+    try:
+        pending = inference_executor.submit(rag_service.query, query, cancelled)
+    except InferenceQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    async def events():
+        answered = False
+        try:
+            # Opens the stream on the client before any work has finished
+            yield ": connected\n\n"
+            try:
+                response = await pending
+                answered = True
+            except QueryCancelled:
+                return
+            except Exception as e:
+                audit_logger.log(
+                    user_id=user_id,
+                    action="CHAT_ERROR",
+                    details={"error": str(e), "query": query[:100]}
+                )
+                yield _sse("error", {"detail": "Internal server error"})
+                return
+            
+            yield _sse("sources", {
+                "intent": response.get("intent"),
+                "intent_similarity": response.get("intent_similarity"),
+                "sources": response.get("sources", [])
+            })
+            answer = response.get("answer", "")
+            size = settings.CHAT_STREAM_CHUNK_CHARS
+            for start in range(0, len(answer), size):
+                yield _sse("answer", {"text": answer[start:start + size]})
+            yield _sse("done", {
+                "confidence": response.get("confidence", 0),
+                "context_used": response.get("context_used", 0),
+                "timings": response.get("timings", {})
+            })
+            
+            audit_logger.log(
+                user_id=user_id,
+                action="CHAT_QUERY",
+                document_id=None,
+                details={**_chat_audit_details(query, response), "stream": True}
+            )
+            audit_logger.log_chat_message(user_id, query, response, channel="stream")
+        finally:
+            # The client went away before the answer was ready. Cancelling this task
+            # has already cancelled pending, but the job keeps running until it sees the event.
+            if not answered:
+                cancelled.set()
+                pending.cancel()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/history")
 async def get_chat_history(
     limit: int = 50,
-    db: Session = Depends(get_db),
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get chat history for the current user (admins can see all)
+    Get chat history for the current user (admins can see all), newest first.
+    Pass next_cursor back as cursor to fetch the next page.
     """
     try:
-        query = db.query(AuditLog).filter(AuditLog.action == "CHAT_QUERY")
+        statement = select(ChatMessage)
         
         # Regular users only see their own history
         if current_user.role not in ["admin", "editor"]:
-            query = query.filter(AuditLog.user_id == current_user.username)
+            statement = statement.where(ChatMessage.user_id == current_user.username)
         
-        history = query.order_by(AuditLog.timestamp.desc()).limit(limit).all()
+        history, next_cursor = await keyset_page(db, statement, ChatMessage.timestamp, ChatMessage.id, cursor, limit)
         
         return {
             "history": [
                 {
-                    "id": log.id,
-                    "timestamp": log.timestamp,
-                    "query": log.details.get("query", ""),
-                    "intent": log.details.get("intent", ""),
-                    "confidence": log.details.get("confidence", 0)
+                    "id": message.id,
+                    "timestamp": message.timestamp,
+                    "user_id": message.user_id,
+                    "query": message.query,
+                    "intent": message.intent or "",
+                    "confidence": message.confidence or 0,
+                    "source_ids": message.source_ids or [],
+                    "channel": message.channel
                 }
-                for log in history
-            ]
+                for message in history
+            ],
+            "next_cursor": next_cursor
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+from app.config import settings
+from app.services.embedding_registry import get_embedding_model
+from app.utils import metrics
+
+
+class MicroBatchEncoder:
+    """
+    Coalesces single-sentence encode calls from concurrent requests.
+
+    Callers block in encode() while a background thread gathers every query
+    that arrives within window_ms (or until max_batch_size is reached) and
+    encodes them with one model.encode call. A larger window trades a few
+    milliseconds of latency for more queries per second.
+    """
+
+    def __init__(self, model, window_ms: float = 5.0, max_batch_size: int = 32):
+        self.model = model
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+        self._thread.start()
+
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.total_encode_seconds = 0.0
+
+    def encode(self, text: str) -> np.ndarray:
+        """Encode one text, sharing the model call with concurrent callers"""
+        return self.submit(text).result()
+
+    def encode_many(self, texts: List[str]) -> List[np.ndarray]:
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _ in batch]
+            start = time.perf_counter()
+            try:
+                embeddings = self.model.encode(texts, batch_size=len(texts))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.total_encode_seconds += time.perf_counter() - start
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": round(self.window_seconds * 1000, 2),
+            "max_batch_size": self.max_batch_size,
+            "pending": self._queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "avg_encode_ms": round(self.total_encode_seconds / self.batches * 1000, 2) if self.batches else 0.0
+        }
+
+
+_encoders: Dict[str, MicroBatchEncoder] = {}
+_lock = threading.Lock()
+
+
+def get_query_encoder(model_name: Optional[str] = None) -> MicroBatchEncoder:
+    """Return the process-wide micro-batching encoder for model_name"""
+    model_name = model_name or settings.EMBEDDING_MODEL
+    encoder = _encoders.get(model_name)
+    if encoder is None:
+        with _lock:
+            encoder = _encoders.get(model_name)
+            if encoder is None:
+                encoder = MicroBatchEncoder(
+                    get_embedding_model(model_name),
+                    window_ms=settings.ENCODER_BATCH_WINDOW_MS,
+                    max_batch_size=settings.ENCODER_MAX_BATCH_SIZE
+                )
+                _encoders[model_name] = encoder
+                metrics.register(f"query_encoder:{model_name}", encoder.stats)
+    return encoder
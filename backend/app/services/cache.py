@@ -0,0 +1,108 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a user query so trivially different spellings share a cache entry"""
+    query = _whitespace.sub(" ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional TTL and hit/miss/eviction counters"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._set_locked(key, value)
+
+    def _set_locked(self, key: Hashable, value: Any):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class VersionedCache(LRUCache):
+    """LRU cache whose entries are only valid for one version of the underlying data"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = None):
+        super().__init__(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.version: Optional[str] = None
+        self.invalidations = 0
+
+    def _check_version(self, version: str):
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    self.invalidations += 1
+                self._data.clear()
+                self.version = version
+
+    def get_versioned(self, key: Hashable, version: str) -> Optional[Any]:
+        self._check_version(version)
+        return self.get((version, key))
+
+    def set_versioned(self, key: Hashable, version: str, value: Any):
+        # Results computed against an older corpus are dropped, not cached
+        with self._lock:
+            if version == self.version:
+                self._set_locked((version, key), value)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({"version": self.version, "invalidations": self.invalidations})
+        return stats
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from app.config import settings
+
+
+class CorpusVersion:
+    """
+    Version token for the searchable corpus, shared through a small file.
+
+    Writers (ingestion, document updates) call bump() after committing new
+    chunks; readers call current(), which only re-reads the file when its
+    mtime changes, so it is cheap enough to check on every query.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._version = "0"
+
+    def current(self) -> str:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return "0"
+
+        # bump() always replaces the file, so the inode changes even when two
+        # writes land within the filesystem's mtime resolution
+        signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        if signature != self._signature:
+            with self._lock:
+                try:
+                    with open(self.path, "r") as f:
+                        self._version = f.read().strip() or "0"
+                    self._signature = signature
+                except FileNotFoundError:
+                    return "0"
+        return self._version
+
+    def bump(self) -> str:
+        """Publish a new version; unique tokens avoid read-modify-write races between processes"""
+        version = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # A unique temp file per call: threads of one process bump concurrently
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".corpus_version.", suffix=".tmp")
+        # mkstemp creates it 0600; the other services' processes must be able to read it
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "w") as f:
+            f.write(version)
+        os.replace(temp_path, self.path)
+        return version
+
+
+corpus_version = CorpusVersion(os.path.join(settings.VECTOR_STORE_PATH, "corpus_version"))
+# Changes only when section_references rows change, so the section index reloads only then
+section_index_version = CorpusVersion(os.path.join(settings.VECTOR_STORE_PATH, "section_index_version"))
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+import numpy as np
+
+from app.config import settings
+from app.services.cache import LRUCache, normalize_query
+from app.utils import metrics
+
+
+class SharedEmbeddingStore:
+    """
+    Cross-process embedding store backed by a SQLite file.
+
+    Point it at a tmpfs path (e.g. /dev/shm) so every uvicorn worker on the
+    host shares one set of cached vectors without going to disk.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_rows: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_query_embeddings_created ON query_embeddings (created)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        try:
+            row = self._connection().execute(
+                "SELECT vector FROM query_embeddings WHERE key = ? AND created > ?",
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Shared embedding cache read failed: {e}")
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def set(self, key: str, vector: np.ndarray):
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, vector, created) VALUES (?, ?, ?)",
+                (key, np.asarray(vector, dtype=np.float32).tobytes(), time.time())
+            )
+            self._writes += 1
+            # Prune expired and overflow rows every so often rather than on each write
+            if self._writes % 256 == 0:
+                conn.execute("DELETE FROM query_embeddings WHERE created <= ?", (time.time() - self.ttl_seconds,))
+                conn.execute(
+                    "DELETE FROM query_embeddings WHERE key IN ("
+                    "SELECT key FROM query_embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,)
+                )
+        except sqlite3.Error as e:
+            print(f"Shared embedding cache write failed: {e}")
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded cache of query embeddings keyed on (model name, normalized query).
+
+    Lookups go to the in-process LRU first and then to the optional shared
+    store, so a question answered by one worker is cheap for all of them.
+    """
+
+    def __init__(self,
+                 max_size: int = 4096,
+                 ttl_seconds: float = 3600,
+                 shared_path: Optional[str] = None):
+        self.local = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.shared = SharedEmbeddingStore(shared_path, ttl_seconds, max_size * 4) if shared_path else None
+
+    @staticmethod
+    def make_key(model_name: str, query: str) -> str:
+        return f"{model_name}\x1f{normalize_query(query)}"
+
+    def get(self, model_name: str, query: str) -> Optional[np.ndarray]:
+        key = self.make_key(model_name, query)
+        vector = self.local.get(key)
+        if vector is None and self.shared is not None:
+            vector = self.shared.get(key)
+            if vector is not None:
+                self.local.set(key, vector)
+        return vector
+
+    def set(self, model_name: str, query: str, vector: np.ndarray):
+        key = self.make_key(model_name, query)
+        vector = np.asarray(vector, dtype=np.float32)
+        self.local.set(key, vector)
+        if self.shared is not None:
+            self.shared.set(key, vector)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.local.stats()
+        if self.shared is not None:
+            lookups = self.shared.hits + self.shared.misses
+            stats["shared"] = {
+                "path": self.shared.path,
+                "hits": self.shared.hits,
+                "misses": self.shared.misses,
+                "hit_rate": round(self.shared.hits / lookups, 4) if lookups else 0.0
+            }
+        return stats
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    shared_path=settings.QUERY_EMBEDDING_CACHE_SHARED_PATH
+)
+metrics.register("query_embedding_cache", query_embedding_cache.stats)
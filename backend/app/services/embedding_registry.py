@@ -0,0 +1,54 @@
+import threading
+import time
+from typing import Dict, Any, Optional
+from sentence_transformers import SentenceTransformer
+
+from app.config import settings
+
+# Process-wide registry of loaded embedding models, keyed by model name
+_models: Dict[str, SentenceTransformer] = {}
+_load_times: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def get_embedding_model(model_name: Optional[str] = None) -> SentenceTransformer:
+    """Return the shared SentenceTransformer for model_name, loading it once per process"""
+    model_name = model_name or settings.EMBEDDING_MODEL
+
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        # Another thread may have loaded it while we waited for the lock
+        model = _models.get(model_name)
+        if model is None:
+            start = time.perf_counter()
+            model = SentenceTransformer(model_name)
+            _load_times[model_name] = time.perf_counter() - start
+            _models[model_name] = model
+    return model
+
+
+def warmup(model_name: Optional[str] = None) -> Dict[str, Any]:
+    """Load the model and run one encode so the first request doesn't pay for it"""
+    model = get_embedding_model(model_name)
+    model.encode(["warmup"])
+    return status()
+
+
+def is_ready(model_name: Optional[str] = None) -> bool:
+    """Check whether the model is loaded in this process"""
+    return (model_name or settings.EMBEDDING_MODEL) in _models
+
+
+def status() -> Dict[str, Any]:
+    """Readiness report for the health endpoint"""
+    return {
+        "ready": is_ready(),
+        "default_model": settings.EMBEDDING_MODEL,
+        "loaded_models": {
+            name: {"load_seconds": round(_load_times.get(name, 0.0), 3)}
+            for name in _models
+        }
+    }
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.config import settings
+from app.utils import metrics
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference queue has no room for another request"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Dedicated thread pool for CPU-bound chat inference with a bounded queue.
+
+    Encoding, LanceDB search and intent classification run here instead of on
+    the event loop. Once max_workers jobs are running and max_queue more are
+    waiting, new submissions are rejected so callers can answer 503 instead
+    of letting latency grow without limit.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, retry_after: int = 1, name: str = "inference"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0  # queued + running
+        self._running = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool, or raise InferenceQueueFull"""
+        return await self.submit(fn, *args, **kwargs)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> "asyncio.Future":
+        """
+        Admit fn to the pool right away (raising InferenceQueueFull if there is no
+        room) and return an awaitable for its result. Call from the event loop.
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise InferenceQueueFull(self.retry_after)
+            self._pending += 1
+            self.submitted += 1
+
+        enqueued_at = time.perf_counter()
+
+        def job():
+            started_at = time.perf_counter()
+            wait = started_at - enqueued_at
+            with self._lock:
+                self._running += 1
+                self.total_wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.total_run_seconds += time.perf_counter() - started_at
+
+        future = self._executor.submit(job)
+        future.add_done_callback(self._on_done)
+        # Cancelling the awaiting task cancels the job too if it hasn't started yet
+        return asyncio.wrap_future(future)
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                self.cancelled += 1
+            else:
+                self.completed += 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.completed + self._running
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queue_depth": max(self._pending - self._running, 0),
+            "running": self._running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "avg_wait_ms": round(self.total_wait_seconds / started * 1000, 2) if started else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            "avg_run_ms": round(self.total_run_seconds / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+
+inference_executor = InferenceExecutor(
+    max_workers=settings.INFERENCE_WORKERS,
+    max_queue=settings.INFERENCE_QUEUE_SIZE,
+    retry_after=settings.INFERENCE_RETRY_AFTER_SECONDS
+)
+metrics.register("inference_executor", inference_executor.stats)
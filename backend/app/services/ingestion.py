@@ -0,0 +1,337 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.session import SessionLocal
+from app.models.document import Document, IngestionJob
+from app.utils.audit_logger import AuditLogger
+from app.services.corpus_version import corpus_version
+from app.services.section_index import replace_section_references, delete_section_references
+
+_processor = None
+
+
+def get_processor():
+    """One PDFProcessor per process; the worker reuses it for every job"""
+    global _processor
+    if _processor is None:
+        from app.services.pdf_processor import PDFProcessor
+        _processor = PDFProcessor(settings)
+    return _processor
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def enqueue_ingestion(db: AsyncSession,
+                            document_id: int,
+                            file_path: str,
+                            metadata: Dict[str, Any],
+                            max_attempts: Optional[int] = None,
+                            previous_document_id: Optional[int] = None) -> IngestionJob:
+    """
+    Add an ingestion job to the session without committing, so the caller can
+    create the document and its job in one transaction. previous_document_id
+    lets a new version reuse the vectors of chunks that didn't change.
+    """
+    job = IngestionJob(
+        document_id=document_id,
+        status="queued",
+        payload={
+            "file_path": file_path,
+            "metadata": metadata,
+            "previous_document_id": previous_document_id
+        },
+        max_attempts=max_attempts or settings.INGESTION_MAX_ATTEMPTS,
+        run_after=_now()
+    )
+    db.add(job)
+    await db.flush()
+    return job
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[IngestionJob]:
+    """
+    Claim the next runnable job with SELECT ... FOR UPDATE SKIP LOCKED so
+    concurrent workers never pick the same row. A 'running' job whose
+    heartbeat (JobHeartbeat) stopped for longer than the timeout belonged to
+    a worker that died and is claimed again, unless it has used up its
+    attempts (a document that kills its worker would otherwise be retried
+    forever).
+    """
+    now = _now()
+    stale_before = now - timedelta(seconds=settings.INGESTION_JOB_TIMEOUT_SECONDS)
+    fail_exhausted_stale_jobs(db, stale_before)
+
+    job = (
+        db.query(IngestionJob)
+        .filter(or_(
+            and_(IngestionJob.status == "queued", IngestionJob.run_after <= now),
+            and_(
+                IngestionJob.status == "running",
+                IngestionJob.locked_at < stale_before,
+                IngestionJob.attempts < IngestionJob.max_attempts
+            )
+        ))
+        .order_by(IngestionJob.run_after, IngestionJob.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        return None
+
+    job.status = "running"
+    job.attempts += 1
+    job.locked_by = worker_id
+    job.locked_at = now
+    db.commit()
+    return job
+
+
+def build_vector_index_if_due() -> bool:
+    """Start an ANN index build if one is due or was requested; see VectorIndexManager.maybe_schedule"""
+    try:
+        return get_processor().vector_store.index_manager.maybe_schedule()
+    except Exception as e:
+        print(f"Vector index build check failed: {e}")
+        return False
+
+
+def refresh_lexical_index_if_due(idle: bool) -> bool:
+    """Rebuild the BM25 index if chunks changed; see VectorIndexManager.refresh_lexical_index_if_due"""
+    try:
+        return get_processor().vector_store.index_manager.refresh_lexical_index_if_due(idle)
+    except Exception as e:
+        print(f"Full-text index refresh failed: {e}")
+        return False
+
+
+def discard_partial_output(db: Session, document_id: int):
+    """
+    Remove the chunks and section references a failed attempt may have
+    written, so a document that never finished processing isn't searchable.
+    Commits the section reference delete.
+    """
+    delete_section_references(db, document_id)
+    db.commit()
+    vector_store = get_processor().vector_store
+    vector_store.delete_document(document_id)
+    vector_store.index_manager.mark_lexical_stale()
+
+
+def fail_exhausted_stale_jobs(db: Session, stale_before: datetime) -> int:
+    """Mark stale 'running' jobs with no attempts left as failed, along with their documents"""
+    jobs = (
+        db.query(IngestionJob)
+        .filter(
+            IngestionJob.status == "running",
+            IngestionJob.locked_at < stale_before,
+            IngestionJob.attempts >= IngestionJob.max_attempts
+        )
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not jobs:
+        db.rollback()
+        return 0
+
+    for job in jobs:
+        error = f"Worker {job.locked_by} stopped responding on attempt {job.attempts} of {job.max_attempts}"
+        job.status = "failed"
+        job.last_error = error
+        job.finished_at = _now()
+        job.locked_by = None
+        job.locked_at = None
+        document = db.query(Document).filter(Document.id == job.document_id).first()
+        if document:
+            document.processing_error = error
+    db.commit()
+
+    for job in jobs:
+        try:
+            discard_partial_output(db, job.document_id)
+        except Exception as e:
+            print(f"Failed to remove partial output of document {job.document_id}: {e}")
+    return len(jobs)
+
+
+class JobHeartbeat:
+    """
+    Renew a claimed job's locked_at every INGESTION_HEARTBEAT_SECONDS from a
+    background thread with its own session, so a long job isn't mistaken for
+    one whose worker died. Stops renewing once the claim has moved on.
+    """
+
+    def __init__(self, job_id: int, worker_id: str, interval: float):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-heartbeat-{job_id}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            db = SessionLocal()
+            try:
+                renewed = db.execute(
+                    update(IngestionJob)
+                    .where(IngestionJob.id == self.job_id,
+                           IngestionJob.status == "running",
+                           IngestionJob.locked_by == self.worker_id)
+                    .values(locked_at=_now())
+                ).rowcount
+                db.commit()
+                if not renewed:
+                    return
+            except Exception as e:
+                db.rollback()
+                print(f"Heartbeat for job {self.job_id} failed: {e}")
+            finally:
+                db.close()
+
+
+def run_job(db: Session, job: IngestionJob, audit_logger: AuditLogger) -> bool:
+    """Process a claimed job and record success, a scheduled retry, or final failure"""
+    payload = job.payload or {}
+    metadata = payload.get("metadata", {})
+    heartbeat = JobHeartbeat(job.id, job.locked_by, settings.INGESTION_HEARTBEAT_SECONDS)
+    # End the transaction the reads above opened; the connection must not sit
+    # idle in transaction (holding its snapshot) while the document is processed
+    db.commit()
+
+    try:
+        with heartbeat:
+            result = get_processor().process_document(
+                payload["file_path"],
+                metadata,
+                previous_document_id=payload.get("previous_document_id")
+            )
+    except Exception as e:
+        result = {"success": False, "error": str(e)}
+
+    document = db.query(Document).filter(Document.id == job.document_id).first()
+    # Index entries go to the database, not into the audit record
+    section_references = result.pop("section_references", [])
+
+    if result["success"]:
+        replace_section_references(db, job.document_id, section_references)
+        job.status = "succeeded"
+        job.finished_at = _now()
+        job.last_error = None
+        if document:
+            document.is_processed = True
+            document.processing_error = None
+            document.total_pages = result.get("total_chunks", 0)
+            document.summary = f"Processed {result['total_sections']} sections"
+
+        # The new version is live, so the superseded one stops taking up search work
+        previous_document_id = payload.get("previous_document_id")
+        if previous_document_id is not None:
+            get_processor().vector_store.delete_document(previous_document_id)
+            delete_section_references(db, previous_document_id)
+            previous = db.query(Document).filter(Document.id == previous_document_id).first()
+            if previous:
+                previous.is_active = False
+    else:
+        error = result.get("error", "Unknown error")
+        job.last_error = error
+        if job.attempts < job.max_attempts:
+            # Exponential backoff: base, 2x base, 4x base, ...
+            delay = settings.INGESTION_RETRY_BACKOFF_SECONDS * (2 ** (job.attempts - 1))
+            job.status = "queued"
+            job.run_after = _now() + timedelta(seconds=delay)
+        else:
+            job.status = "failed"
+            job.finished_at = _now()
+            if document:
+                document.processing_error = error
+
+    job.locked_by = None
+    job.locked_at = None
+    db.commit()
+
+    if not result["success"]:
+        # Chunks written before the failure would otherwise stay searchable until a retry replaces them
+        try:
+            discard_partial_output(db, job.document_id)
+        except Exception as e:
+            print(f"Failed to remove partial output of document {job.document_id}: {e}")
+
+    if result["success"]:
+        # Cached answers were computed without this document's chunks
+        corpus_version.bump()
+        index_manager = get_processor().vector_store.index_manager
+        # The BM25 index is rebuilt once the queue goes quiet (refresh_lexical_index_if_due)
+        index_manager.mark_lexical_stale()
+        # Build or refresh the ANN index in the background once enough rows have changed
+        index_manager.maybe_schedule()
+
+    if job.status != "queued":
+        audit_logger.log(
+            user_id=metadata.get("uploaded_by", "system"),
+            action="PROCESS_COMPLETE" if result["success"] else "PROCESS_FAILED",
+            document_id=job.document_id,
+            details={"job_id": job.id, "attempts": job.attempts, **result}
+        )
+    return result["success"]
+
+
+async def requeue_failed_documents(db: AsyncSession, requested_by: str) -> int:
+    """Queue a fresh job for every document whose processing failed"""
+    failed = (await db.execute(
+        select(Document)
+        .where(Document.processing_error.isnot(None), Document.is_processed == False)
+    )).scalars().all()
+    for document in failed:
+        document.processing_error = None
+        await enqueue_ingestion(db, document.id, document.file_path, {
+            "source": document.source,
+            "document_type": document.document_type,
+            "uploaded_by": requested_by,
+            "document_id": document.id
+        }, previous_document_id=document.previous_version_id)
+    await db.commit()
+    return len(failed)
+
+
+async def find_duplicate_document(db: AsyncSession, content_hash: str) -> Optional[Document]:
+    """Return a live document with identical file content that hasn't failed processing"""
+    return (await db.execute(
+        select(Document)
+        .where(
+            Document.content_hash == content_hash,
+            Document.processing_error.is_(None),
+            Document.is_active.isnot(False)
+        )
+        .order_by(Document.id.desc())
+        .limit(1)
+    )).scalars().first()
+
+
+def job_to_dict(job: IngestionJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "document_id": job.document_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after,
+        "last_error": job.last_error,
+        "locked_by": job.locked_by,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
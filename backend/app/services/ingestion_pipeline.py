@@ -0,0 +1,222 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.services.section_index import normalize_act, parse_section_header
+
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage has failed"""
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.blocked_seconds = 0.0  # time spent waiting on a full downstream queue
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at if self.started_at else 0.0
+        return {
+            "items": self.items,
+            "seconds": round(elapsed, 3),
+            "items_per_second": round(self.items / elapsed, 2) if elapsed > 0 else 0.0,
+            "blocked_seconds": round(self.blocked_seconds, 3)
+        }
+
+
+class StreamingIngestionPipeline:
+    """
+    pages -> sections -> chunks -> embedding batches -> LanceDB appends
+
+    Each stage runs in its own thread and hands work to the next through a
+    bounded queue, so extraction keeps going while a batch is being embedded
+    and at most queue_size items are buffered between any two stages. Peak
+    memory therefore depends on the queue and batch sizes, not on how long
+    the document is.
+    """
+
+    def __init__(self, processor, queue_size: int = 64, embed_batch_size: int = 64,
+                 reusable_embeddings: Optional[Dict[str, List[float]]] = None):
+        self.processor = processor
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        # content_hash -> vector from a previous version of the document
+        self.reusable_embeddings = reusable_embeddings or {}
+        self._abort = threading.Event()
+        self._errors: List[BaseException] = []
+
+        self.total_sections = 0
+        self.total_chunks = 0
+        self.chunks_embedded = 0
+        self.chunks_reused = 0
+        self.sample_sections: List[Dict] = []
+        # (act, section number) -> chunk id entries for the exact section lookup index
+        self.section_references: List[Dict] = []
+
+    # Queue helpers that give up when another stage has failed
+
+    def _put(self, q: queue.Queue, item, stats: Optional[StageStats] = None):
+        start = time.perf_counter()
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if stats is not None:
+            stats.blocked_seconds += time.perf_counter() - start
+
+    def _drain(self, q: queue.Queue) -> Iterator:
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def _run_stage(self, stats: StageStats, transform: Callable[[Iterable], Iterable],
+                   in_q: Optional[queue.Queue], out_q: queue.Queue):
+        stats.started_at = time.perf_counter()
+        try:
+            source = self._drain(in_q) if in_q is not None else iter(())
+            for item in transform(source):
+                stats.items += 1
+                self._put(out_q, item, stats)
+            self._put(out_q, _DONE)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._errors.append(e)
+            self._abort.set()
+        finally:
+            stats.finished_at = time.perf_counter()
+
+    # Stage transforms
+
+    def _sections(self, pages: Iterable[Dict]) -> Iterator[Dict]:
+        for section in self.processor.iter_cyber_law_sections(self.processor.iter_page_lines(pages)):
+            self.total_sections += 1
+            if len(self.sample_sections) < 5:
+                self.sample_sections.append(section)
+            yield section
+
+    def _chunks(self, sections: Iterable[Dict], metadata: Dict) -> Iterator[Dict]:
+        # Chunk indices run across the whole document so chunk ids are unique
+        next_index = 0
+        # Sections belong to the most recent Act named in a header, else the document's source
+        current_act = normalize_act(metadata.get('source'))
+        for section in sections:
+            current_act = normalize_act(section['title']) or current_act
+            section_number = parse_section_header(section['title'])
+
+            section_metadata = metadata.copy()
+            section_metadata.update({
+                'section_title': section['title'],
+                'keywords': section['keywords']
+            })
+            chunks = self.processor.create_chunks(section['content'], section_metadata, start_index=next_index)
+            next_index += len(chunks)
+            if section_number:
+                self.section_references.extend(
+                    {'act': current_act, 'section_number': section_number, 'chunk_id': chunk['metadata']['chunk_id']}
+                    for chunk in chunks
+                )
+            yield from chunks
+
+    def _embed(self, chunks: Iterable[Dict]) -> Iterator[List[Dict]]:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.embed_batch_size:
+                yield self._embed_batch(batch)
+                batch = []
+        if batch:
+            yield self._embed_batch(batch)
+
+    def _embed_batch(self, batch: List[Dict]) -> List[Dict]:
+        # Only chunks whose text changed since the previous version need the model
+        to_encode = []
+        for chunk in batch:
+            embedding = self.reusable_embeddings.get(chunk['metadata'].get('content_hash'))
+            if embedding is not None:
+                chunk['embedding'] = embedding
+                self.chunks_reused += 1
+            else:
+                to_encode.append(chunk)
+
+        if to_encode:
+            texts = [chunk['content'] for chunk in to_encode]
+            embeddings = self.processor.embedding_model.encode(texts, batch_size=len(texts)).tolist()
+            for chunk, embedding in zip(to_encode, embeddings):
+                chunk['embedding'] = embedding
+            self.chunks_embedded += len(to_encode)
+        return batch
+
+    def _write(self, batches: Iterable[List[Dict]]) -> Iterator[int]:
+        for batch in batches:
+            added = self.processor.vector_store.add_embeddings(
+                [chunk['content'] for chunk in batch],
+                [chunk['metadata'] for chunk in batch],
+                [chunk['embedding'] for chunk in batch]
+            )
+            self.total_chunks += added
+            yield added
+
+    def run(self, file_path: str, metadata: Dict) -> Dict[str, Any]:
+        """Run every stage to completion and return counts and per-stage throughput"""
+        stages = [
+            ("pages", lambda _: self.processor.iter_pages(file_path)),
+            ("sections", self._sections),
+            ("chunks", lambda sections: self._chunks(sections, metadata)),
+            ("embedding_batches", self._embed),
+            ("appends", self._write),
+        ]
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        stats = [StageStats(name) for name, _ in stages]
+        threads = []
+        for i, (name, transform) in enumerate(stages):
+            in_q = queues[i - 1] if i > 0 else None
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(stats[i], transform, in_q, queues[i]),
+                name=f"ingest-{name}",
+                daemon=True
+            )
+            threads.append(thread)
+            thread.start()
+
+        # Consume the final stage's output so it never blocks
+        try:
+            for _ in self._drain(queues[-1]):
+                pass
+        except PipelineAborted:
+            pass
+
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        return {
+            'total_sections': self.total_sections,
+            'total_chunks': self.total_chunks,
+            'chunks_embedded': self.chunks_embedded,
+            'chunks_reused': self.chunks_reused,
+            'sections': self.sample_sections,
+            'section_references': self.section_references,
+            'stages': {s.name: s.to_dict() for s in stats}
+        }
@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from app.config import settings
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class CentroidIntentClassifier:
+    """
+    Nearest-centroid intent classifier over query embeddings.
+
+    Each intent is the normalized mean of its example embeddings, so scoring
+    a query is a cosine similarity against every centroid: one matrix
+    multiply for a whole batch, using the embedding retrieval already made.
+    """
+
+    def __init__(self, labels: List[str], centroids: np.ndarray, model_name: str,
+                 min_similarity: float = 0.0):
+        self.labels = list(labels)
+        self.centroids = _normalize_rows(centroids)
+        self.model_name = model_name
+        # Queries no closer than this to any centroid are 'general'
+        self.min_similarity = min_similarity
+
+    @classmethod
+    def train(cls, examples: Dict[str, List[str]], embedding_model, model_name: str) -> "CentroidIntentClassifier":
+        labels = sorted(intent for intent, texts in examples.items() if texts)
+        centroids = []
+        for intent in labels:
+            embeddings = _normalize_rows(embedding_model.encode(examples[intent]))
+            centroids.append(embeddings.mean(axis=0))
+        return cls(labels, np.vstack(centroids), model_name)
+
+    def classify_many(self, embeddings) -> List[Tuple[str, float]]:
+        """(intent, cosine similarity) for each row of an embedding matrix"""
+        if len(self.labels) == 0:
+            return [("general", 0.0)] * len(embeddings)
+        scores = _normalize_rows(embeddings) @ self.centroids.T
+        best = scores.argmax(axis=1)
+        results = []
+        for row, index in enumerate(best):
+            similarity = float(scores[row, index])
+            intent = self.labels[index] if similarity >= self.min_similarity else "general"
+            results.append((intent, round(similarity, 4)))
+        return results
+
+    def classify(self, embedding) -> Tuple[str, float]:
+        return self.classify_many([embedding])[0]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                labels=np.asarray(self.labels),
+                centroids=self.centroids,
+                model_name=np.asarray(self.model_name)
+            )
+
+    @classmethod
+    def load(cls, path: str, min_similarity: float = 0.0) -> "CentroidIntentClassifier":
+        with np.load(path) as artifact:
+            return cls(
+                [str(label) for label in artifact["labels"]],
+                artifact["centroids"],
+                str(artifact["model_name"]),
+                min_similarity=min_similarity
+            )
+
+
+def load_examples(path: str) -> Dict[str, List[str]]:
+    """Intent -> example queries, from a JSON object"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_intent_classifier(embedding_model, model_name: str) -> Optional[CentroidIntentClassifier]:
+    """
+    Load the trained artifact. If it is missing or was trained for another
+    embedding model, fall back to training from the examples file in-process.
+    """
+    path = settings.INTENT_MODEL_PATH
+    if os.path.exists(path):
+        try:
+            classifier = CentroidIntentClassifier.load(path, settings.INTENT_MIN_SIMILARITY)
+            if classifier.model_name == model_name:
+                return classifier
+            print(f"Intent model {path} was trained for {classifier.model_name}, not {model_name}; retraining")
+        except Exception as e:
+            print(f"Could not load intent model {path}: {e}")
+    else:
+        print(f"Intent model {path} not found; training from {settings.INTENT_EXAMPLES_PATH}")
+
+    try:
+        classifier = CentroidIntentClassifier.train(
+            load_examples(settings.INTENT_EXAMPLES_PATH), embedding_model, model_name
+        )
+    except Exception as e:
+        print(f"Intent classifier unavailable: {e}")
+        return None
+    classifier.min_similarity = settings.INTENT_MIN_SIMILARITY
+    return classifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the intent classifier artifact from an examples file")
+    parser.add_argument("--examples", default=settings.INTENT_EXAMPLES_PATH)
+    parser.add_argument("--output", default=settings.INTENT_MODEL_PATH)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    from app.services.embedding_registry import get_embedding_model
+
+    examples = load_examples(args.examples)
+    classifier = CentroidIntentClassifier.train(examples, get_embedding_model(args.model), args.model)
+    classifier.save(args.output)
+
+    # Training-set accuracy is a sanity check, not an evaluation
+    embedding_model = get_embedding_model(args.model)
+    correct = total = 0
+    for intent, texts in examples.items():
+        predictions = classifier.classify_many(embedding_model.encode(texts))
+        correct += sum(1 for predicted, _ in predictions if predicted == intent)
+        total += len(texts)
+    print(f"Saved {len(classifier.labels)} intents to {args.output} (training accuracy {correct}/{total})")
+
+
+if __name__ == "__main__":
+    main()
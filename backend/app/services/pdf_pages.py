@@ -0,0 +1,118 @@
+"""
+Page-level PDF extraction.
+
+Kept free of heavy imports (models, LanceDB) so spawned extraction
+processes start quickly.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+import pdfplumber
+from pdfminer.pdfpage import PDFPage
+from pdfplumber.page import Page
+
+from app.config import settings
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _extract_page(page) -> str:
+    text = page.extract_text(x_tolerance=1, y_tolerance=1)
+    # Drop the parsed layout objects; pdfplumber keeps them until the PDF closes
+    page.flush_cache()
+    return text
+
+
+def _iter_page_range(pdf, start: int, end: int) -> Iterator[Tuple[int, Page]]:
+    """
+    Pages [start, end) without building pdf.pages, which would wrap every page
+    of the document in each task. The page tree is walked only up to end.
+    """
+    page_objects = islice(PDFPage.create_pages(pdf.doc), start, end)
+    for page_num, page_obj in enumerate(page_objects, start):
+        yield page_num, Page(pdf, page_obj, page_number=page_num + 1)
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[Dict]:
+    """Extract pages [start, end) as {'page_number', 'text'} records (runs in a pool process)"""
+    records = []
+    with pdfplumber.open(file_path) as pdf:
+        for page_num, page in _iter_page_range(pdf, start, end):
+            text = _extract_page(page)
+            if text:
+                records.append({'page_number': page_num + 1, 'text': text})
+    return records
+
+
+def default_extract_workers() -> int:
+    """Each ingestion worker process has its own extraction pool, so they split the CPUs"""
+    return max(1, (os.cpu_count() or 1) // max(1, settings.INGESTION_WORKERS))
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Reuse one extraction pool per process instead of spawning per document"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+    return _pool
+
+
+def iter_pdf_pages(file_path: str,
+                   workers: int = 0,
+                   pages_per_task: int = 16,
+                   parallel_min_pages: int = 32) -> Iterator[Dict]:
+    """
+    Yield {'page_number', 'text'} records in page order.
+
+    Documents with at least parallel_min_pages pages are split into ranges of
+    pages_per_task and extracted across a process pool. Only a few ranges are
+    in flight at once, so memory stays bounded however long the PDF is.
+    workers=0 means a share of the CPUs (see default_extract_workers).
+    """
+    workers = workers or default_extract_workers()
+
+    with pdfplumber.open(file_path) as pdf:
+        total_pages = len(pdf.pages)
+        if workers <= 1 or total_pages < parallel_min_pages:
+            for page_num, page in enumerate(pdf.pages):
+                text = _extract_page(page)
+                if text:
+                    yield {'page_number': page_num + 1, 'text': text}
+            return
+
+    ranges = iter([
+        (start, min(start + pages_per_task, total_pages))
+        for start in range(0, total_pages, pages_per_task)
+    ])
+    pool = _get_pool(workers)
+
+    pending = deque()
+    for _ in range(workers * 2):
+        page_range = next(ranges, None)
+        if page_range is None:
+            break
+        pending.append(pool.submit(extract_page_range, file_path, *page_range))
+
+    try:
+        while pending:
+            records = pending.popleft().result()
+            page_range = next(ranges, None)
+            if page_range is not None:
+                pending.append(pool.submit(extract_page_range, file_path, *page_range))
+            yield from records
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,121 +1,89 @@
 import os
-import re
-from typing import List, Dict, Any
-import pdfplumber
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import hashlib
 from datetime import datetime
 
 # Import the new LanceDB VectorStoreManager
-from app.services.vector_store import VectorStoreManager  # Updated import
+from app.services.vector_store import VectorStoreManager, get_vector_store
+from app.services.embedding_registry import get_embedding_model
+from app.services.pdf_pages import iter_pdf_pages
+from app.services.ingestion_pipeline import StreamingIngestionPipeline
+from app.services.section_extractor import SectionExtractor
 
 class PDFProcessor:
     def __init__(self, config):
         self.config = config
-        self.embedding_model = SentenceTransformer(config.EMBEDDING_MODEL)
+        self.embedding_model = get_embedding_model(config.EMBEDDING_MODEL)
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=config.CHUNK_SIZE,
             chunk_overlap=config.CHUNK_OVERLAP,
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
+        self.section_extractor = SectionExtractor(config.SECTION_KEYWORDS)
         
-        # Initialize LanceDB vector store
+        # The process-wide LanceDB vector store
         os.makedirs(config.VECTOR_STORE_PATH, exist_ok=True)
-        self.vector_store = VectorStoreManager(
-            db_path=os.path.join(config.VECTOR_STORE_PATH, "lancedb"),
-            table_name="cyber_laws"
-        )
+        self.vector_store = get_vector_store()
     
-    def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF with structure preservation"""
-        text = ""
+    def iter_pages(self, file_path: str) -> Iterator[Dict]:
+        """Stream {'page_number', 'text'} records, extracting large PDFs in parallel"""
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    # Extract text with layout preservation
-                    page_text = page.extract_text(x_tolerance=1, y_tolerance=1)
-                    if page_text:
-                        # Add page marker
-                        text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
+            yield from iter_pdf_pages(
+                file_path,
+                workers=self.config.PDF_EXTRACT_WORKERS,
+                pages_per_task=self.config.PDF_PAGES_PER_TASK,
+                parallel_min_pages=self.config.PDF_PARALLEL_MIN_PAGES
+            )
         except Exception as e:
             raise Exception(f"PDF extraction failed: {str(e)}")
-        return text
+    
+    def extract_text_from_pdf(self, file_path: str) -> str:
+        """Extract text from PDF with structure preservation"""
+        parts = []
+        for page in self.iter_pages(file_path):
+            # Add page marker
+            parts.append(f"\n--- Page {page['page_number']} ---\n{page['text']}\n")
+        return "".join(parts)
     
     def extract_cyber_law_sections(self, text: str) -> List[Dict[str, Any]]:
         """Extract cyber law specific sections using patterns"""
-        sections = []
-        
-        # Patterns for Indian Cyber Laws
-        patterns = [
-            r'(IT\s+Act,\s*2000|Information\s+Technology\s+Act,\s*2000)',
-            r'SECTION\s+\d+[A-Z]*\s*[:\.]?\s*(.+)',
-            r'(Cyber\s+Crime|Cyber\s+Security|Data\s+Protection|Digital\s+Signature)',
-            r'^\s*(\d+[\.\)])\s+(.+)$',  # Numbered sections
-        ]
-        
-        lines = text.split('\n')
-        current_section = None
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check for section headers
-            for pattern in patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    if current_section:
-                        sections.append(current_section)
-                    
-                    current_section = {
-                        'title': line,
-                        'content': '',
-                        'type': 'section',
-                        'keywords': self.extract_keywords(line)
-                    }
-                    break
-            else:
-                # Add to current section
-                if current_section:
-                    current_section['content'] += line + ' '
-        
-        if current_section:
-            sections.append(current_section)
-        
-        return sections
+        return list(self.iter_cyber_law_sections(text.split('\n')))
+    
+    def iter_cyber_law_sections(self, lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Yield each section as soon as the next header closes it"""
+        return self.section_extractor.iter_sections(lines)
+    
+    @staticmethod
+    def iter_page_lines(pages: Iterable[Dict]) -> Iterator[str]:
+        """Turn page records back into lines, with the same page markers extract_text_from_pdf adds"""
+        for page in pages:
+            yield f"--- Page {page['page_number']} ---"
+            yield from page['text'].split('\n')
     
     def extract_keywords(self, text: str) -> List[str]:
         """Extract relevant keywords"""
-        cyber_keywords = [
-            'hacking', 'phishing', 'malware', 'data breach', 'encryption',
-            'digital signature', 'electronic record', 'cyber terrorism',
-            'identity theft', 'privacy', 'certifying authority', 'intermediary',
-            'computer resource', 'network service', 'electronic governance'
-        ]
-        
-        found_keywords = []
-        text_lower = text.lower()
-        for keyword in cyber_keywords:
-            if keyword in text_lower:
-                found_keywords.append(keyword)
-        
-        return found_keywords
+        return self.section_extractor.keyword_matcher.find(text)
+    
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """SHA-256 of a chunk's text; equal hashes can share an embedding"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
     
-    def create_chunks(self, text: str, metadata: Dict) -> List[Dict]:
-        """Split text into chunks for embedding"""
+    def create_chunks(self, text: str, metadata: Dict, start_index: int = 0) -> List[Dict]:
+        """Split text into chunks for embedding (indices continue from start_index)"""
         chunks = self.text_splitter.split_text(text)
         
         chunk_data = []
-        for i, chunk in enumerate(chunks):
+        for i, chunk in enumerate(chunks, start=start_index):
             chunk_metadata = metadata.copy()
             chunk_metadata.update({
                 'chunk_index': i,
-                'chunk_id': f"{metadata.get('document_id', '')}_chunk_{i}",
+                'chunk_id': VectorStoreManager.make_chunk_id(metadata.get('document_id', ''), i),
                 'word_count': len(chunk.split()),
-                'char_count': len(chunk)
+                'char_count': len(chunk),
+                'content_hash': self.content_hash(chunk)
             })
             
             chunk_data.append({
@@ -144,43 +112,45 @@ class PDFProcessor:
         except Exception as e:
             raise Exception(f"Vector store update failed: {str(e)}")
     
-    def process_document(self, file_path: str, metadata: Dict) -> Dict[str, Any]:
-        """Main processing pipeline"""
+    def process_document(self, file_path: str, metadata: Dict,
+                         previous_document_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Main processing pipeline (streams pages through to LanceDB in bounded batches).
+        When previous_document_id is given, chunks whose text is unchanged reuse
+        that version's vectors instead of being embedded again.
+        """
         try:
-            # Extract text
-            print(f"Extracting text from {file_path}")
-            text = self.extract_text_from_pdf(file_path)
+            print(f"Processing {file_path}")
+            # Drop rows left by an earlier failed attempt at this document
+            if metadata.get('document_id') is not None:
+                self.vector_store.delete_document(metadata['document_id'])
             
-            # Extract sections
-            print("Extracting cyber law sections...")
-            sections = self.extract_cyber_law_sections(text)
+            reusable = {}
+            if previous_document_id is not None:
+                reusable = self.vector_store.get_embeddings_by_hash(previous_document_id)
             
-            # Create chunks
-            print("Creating chunks...")
-            all_chunks = []
-            for section in sections:
-                section_metadata = metadata.copy()
-                section_metadata.update({
-                    'section_title': section['title'],
-                    'keywords': section['keywords']
-                })
-                
-                chunks = self.create_chunks(section['content'], section_metadata)
-                all_chunks.extend(chunks)
-            
-            # Add to vector store
-            print("Adding to vector database...")
-            chunks_added = self.add_to_vector_store(all_chunks)
+            pipeline = StreamingIngestionPipeline(
+                self,
+                queue_size=self.config.PIPELINE_QUEUE_SIZE,
+                embed_batch_size=self.config.EMBED_BATCH_SIZE,
+                reusable_embeddings=reusable
+            )
+            result = pipeline.run(file_path, metadata)
+            print(f"Processed {file_path}: {result['stages']}")
             
             return {
                 'success': True,
-                'total_sections': len(sections),
-                'total_chunks': chunks_added,
-                'sections': sections[:5]  # Return first 5 sections as sample
+                'total_sections': result['total_sections'],
+                'total_chunks': result['total_chunks'],
+                'sections': result['sections'],  # First 5 sections as sample
+                'chunks_embedded': result['chunks_embedded'],
+                'chunks_reused': result['chunks_reused'],
+                'section_references': result['section_references'],
+                'stages': result['stages']
             }
             
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e)
-            }
\ No newline at end of file
+            }
@@ -0,0 +1,19 @@
+from app.config import settings
+from app.services.cache import VersionedCache
+from app.services.corpus_version import CorpusVersion
+from app.utils import metrics
+
+# Authenticated users keyed by (token subject, token signature). Entries live
+# at most PRINCIPAL_CACHE_TTL_SECONDS, and every process drops all of them as
+# soon as the shared version token is bumped.
+principal_cache = VersionedCache(
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+principal_version = CorpusVersion(settings.PRINCIPAL_VERSION_PATH)
+metrics.register("principal_cache", principal_cache.stats)
+
+
+def invalidate_principals():
+    """Call after changing a user's role or active flag so no process keeps serving the old row"""
+    principal_version.bump()
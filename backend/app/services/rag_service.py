@@ -1,130 +1,194 @@
-import os
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
-from sklearn.svm import LinearSVC
-from sklearn.feature_extraction.text import TfidfVectorizer
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import numpy as np
 
 # Import the new LanceDB VectorStoreManager
-from app.services.vector_store import VectorStoreManager  # Updated import
+from app.services.vector_store import get_vector_store
+from app.services.embedding_registry import get_embedding_model
+from app.services.cache import VersionedCache, normalize_query
+from app.services.corpus_version import corpus_version
+from app.services.section_index import SectionIndex, parse_section_reference
+from app.services.intent_classifier import load_intent_classifier
+from app.database.session import SessionLocal
+from app.utils import metrics
+
+class QueryCancelled(Exception):
+    """Raised inside a query once its caller has gone away"""
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: int = 60) -> List[Tuple[Dict, float]]:
+    """Fuse ranked lists: each hit scores sum(1 / (k + rank)) over the lists it appears in"""
+    scores: Dict[Any, float] = {}
+    hits: Dict[Any, Dict] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            key = result.get('id', id(result))
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            # Prefer the vector hit's row, whose _distance came from LanceDB itself
+            hits.setdefault(key, result)
+    return sorted(((hits[key], score) for key, score in scores.items()), key=lambda item: item[1], reverse=True)
 
 class HybridRAGService:
     def __init__(self, config):
         self.config = config
-        self.embedding_model = SentenceTransformer(config.EMBEDDING_MODEL)
+        self.embedding_model = get_embedding_model(config.EMBEDDING_MODEL)
         
-        # Initialize LanceDB vector store
-        self.vector_store = VectorStoreManager(
-            db_path=os.path.join(config.VECTOR_STORE_PATH, "lancedb"),
-            table_name="cyber_laws"
-        )
+        # The process-wide LanceDB vector store, shared with the admin routes
+        self.vector_store = get_vector_store()
         
-        # Intent classifier setup
-        self.intent_classifier = None
-        self.vectorizer = TfidfVectorizer(max_features=1000)
-        self.setup_intent_classifier()
-    
-    def setup_intent_classifier(self):
-        """Setup intent classification with common cyber law queries"""
-        # Training data for intent classification
-        intents = {
-            'definition': [
-                "What is hacking?",
-                "Define phishing",
-                "What does cyber crime mean?",
-                "Explain digital signature",
-                "What is the IT Act?"
-            ],
-            'penalty': [
-                "What is the punishment for hacking?",
-                "Penalty for data theft",
-                "Fine for cyber fraud",
-                "Jail term for online harassment",
-                "Legal consequences of phishing"
-            ],
-            'procedure': [
-                "How to file cyber crime complaint?",
-                "Procedure for digital signature",
-                "Steps to report online fraud",
-                "Process for data protection compliance",
-                "How to register cyber complaint?"
-            ],
-            'section': [
-                "Section 66 of IT Act",
-                "What is Section 43A?",
-                "Explain IT Act Section 72",
-                "Cyber law section for hacking",
-                "Legal section for data breach"
-            ]
-        }
+        # Vector and lexical retrieval run side by side
+        self.retrieval_pool = ThreadPoolExecutor(
+            max_workers=config.INFERENCE_WORKERS * 2,
+            thread_name_prefix="retrieval"
+        )
+        # Batch queries search on their own pool so they never queue ahead of interactive ones
+        self.batch_retrieval_pool = ThreadPoolExecutor(
+            max_workers=config.BATCH_RETRIEVAL_WORKERS * 2,
+            thread_name_prefix="batch-retrieval"
+        )
         
-        # Prepare training data
-        X_train = []
-        y_train = []
+        # Exact (act, section) lookups skip embedding and vector search
+        self.section_index = SectionIndex(SessionLocal)
         
-        for intent, examples in intents.items():
-            X_train.extend(examples)
-            y_train.extend([intent] * len(examples))
+        # Nearest-centroid intents over the query embedding (python -m app.services.intent_classifier)
+        self.intent_classifier = load_intent_classifier(self.embedding_model, config.EMBEDDING_MODEL)
         
-        # Vectorize and train
-        if X_train:
-            X_vec = self.vectorizer.fit_transform(X_train)
-            self.intent_classifier = LinearSVC()
-            self.intent_classifier.fit(X_vec, y_train)
+        # Answers are only valid for the corpus version they were computed against
+        self.answer_cache = VersionedCache(
+            max_size=config.ANSWER_CACHE_SIZE,
+            ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS
+        )
+        metrics.register("answer_cache", self.answer_cache.stats)
     
-    def classify_intent(self, query: str) -> str:
+    def classify_intents(self, query_embeddings) -> List[Tuple[str, float]]:
+        """(intent, similarity) for a batch of query embeddings in one matrix multiply"""
+        if self.intent_classifier is None:
+            return [("general", 0.0)] * len(query_embeddings)
+        return self.intent_classifier.classify_many(query_embeddings)
+    
+    def classify_intent(self, query: str, query_embedding=None) -> str:
         """Classify user query intent"""
-        if not self.intent_classifier:
+        if self.intent_classifier is None:
             return "general"
+        if query_embedding is None:
+            query_embedding = self.vector_store.embed_query(query)
+        return self.intent_classifier.classify(query_embedding)[0]
+    
+    @staticmethod
+    def _timed(fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return result, round((time.perf_counter() - start) * 1000, 2)
+    
+    @staticmethod
+    def _format_result(result: Dict, rrf_score: float = 0.0) -> Dict:
+        # LanceDB returns results as dict with '_distance' field
+        score = 1 - (result.get('_distance', 1.0) / 2) if '_distance' in result else 0.8
+        return {
+            'content': result.get('text', ''),
+            'metadata': {k: v for k, v in result.items() if k not in ['text', 'embedding', '_distance', '_score', 'score']},
+            'score': score,
+            'rrf_score': round(rrf_score, 6)
+        }
+    
+    def retrieve(self, query: str, intent: str, top_k: int = 5,
+                 filters: Optional[Dict[str, Any]] = None, query_embedding=None,
+                 cancelled: Optional[threading.Event] = None):
+        """
+        Run vector and BM25 retrieval concurrently and fuse them with reciprocal-rank
+        fusion. Returns (results, per-retriever timings in ms).
+        """
+        if query_embedding is None:
+            query_embedding = self.vector_store.embed_query(query)
+        start = time.perf_counter()
+        vector_future, lexical_future = self._submit_retrieval(query, intent, top_k, filters, query_embedding)
+        if cancelled is not None:
+            # Poll so an abandoned query gives its retrieval slots back early
+            while wait([vector_future, lexical_future], timeout=0.05).not_done:
+                if cancelled.is_set():
+                    vector_future.cancel()
+                    lexical_future.cancel()
+                    raise QueryCancelled()
+        return self._collect_retrieval(vector_future, lexical_future, top_k, start)
+    
+    def _submit_retrieval(self, query: str, intent: str, top_k: int,
+                          filters: Optional[Dict[str, Any]], query_embedding, pool=None):
+        pool = pool or self.retrieval_pool
+        filters = dict(filters or {})
+        # For section queries, only consider chunks that carry section metadata
+        if intent == 'section' and 'section' not in query.lower():
+            filters['has_section'] = True
+        
+        # Filters are applied inside LanceDB, so no over-fetching is needed
+        vector_future = pool.submit(
+            self._timed, self.vector_store.search, query,
+            n_results=self.config.HYBRID_VECTOR_CANDIDATES or top_k, filters=filters,
+            query_embedding=query_embedding
+        )
+        lexical_future = pool.submit(
+            self._timed, self.vector_store.lexical_search, query,
+            n_results=self.config.HYBRID_LEXICAL_CANDIDATES or top_k * 2, filters=filters,
+            query_embedding=query_embedding
+        )
+        return vector_future, lexical_future
+    
+    def _collect_retrieval(self, vector_future, lexical_future, top_k: int, start: float):
+        vector_hits, vector_ms = vector_future.result()
+        try:
+            lexical_hits, lexical_ms = lexical_future.result()
+        except Exception as e:
+            print(f"Lexical search error: {e}")
+            lexical_hits, lexical_ms = [], None
+        
+        fused = reciprocal_rank_fusion([vector_hits, lexical_hits], k=self.config.HYBRID_RRF_K)
+        results = [self._format_result(hit, rrf_score) for hit, rrf_score in fused[:top_k]]
+        timings = {
+            'vector_ms': vector_ms,
+            'lexical_ms': lexical_ms,
+            'vector_hits': len(vector_hits),
+            'lexical_hits': len(lexical_hits),
+            'retrieval_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+        return results, timings
+    
+    def lookup_section(self, query: str, top_k: int = 5) -> List[Dict]:
+        """Chunks for an explicit section reference such as 'Section 43A of the IT Act', if indexed"""
+        reference = parse_section_reference(query)
+        if reference is None:
+            return []
+        
+        chunk_ids = self.section_index.lookup(*reference, limit=top_k)
+        if not chunk_ids:
+            return []
         
-        query_vec = self.vectorizer.transform([query])
-        intent = self.intent_classifier.predict(query_vec)[0]
-        return intent
+        results = []
+        for row in self.vector_store.get_chunks(chunk_ids):
+            # An exact section match is as relevant as retrieval gets
+            row['_distance'] = 0.0
+            results.append(self._format_result(row))
+        return results
     
-    def search_documents(self, query: str, intent: str, top_k: int = 5) -> List[Dict]:
+    def search_documents(self, query: str, intent: str, top_k: int = 5,
+                         filters: Optional[Dict[str, Any]] = None) -> List[Dict]:
         """Search relevant documents using hybrid approach"""
         try:
-            # Search using LanceDB vector store
-            search_results = self.vector_store.search(query, n_results=top_k * 2)
-            
-            # Filter and format results
-            filtered_results = []
-            for result in search_results:
-                # LanceDB returns results as dict with '_distance' field
-                score = 1 - (result.get('_distance', 1.0) / 2) if '_distance' in result else 0.8
-                
-                # Intent-based filtering
-                if intent == 'section' and 'section' not in query.lower():
-                    # For section queries, prioritize section metadata
-                    if 'section_title' in result:
-                        filtered_results.append({
-                            'content': result.get('text', ''),
-                            'metadata': {k: v for k, v in result.items() if k not in ['text', 'embedding', '_distance']},
-                            'score': score
-                        })
-                else:
-                    filtered_results.append({
-                        'content': result.get('text', ''),
-                        'metadata': {k: v for k, v in result.items() if k not in ['text', 'embedding', '_distance']},
-                        'score': score
-                    })
-            
-            # Sort by score and return top_k
-            filtered_results.sort(key=lambda x: x['score'], reverse=True)
-            return filtered_results[:top_k]
+            results, _ = self.retrieve(query, intent, top_k=top_k, filters=filters)
+            return results
             
         except Exception as e:
             print(f"Search error: {e}")
             return []
     
-    def generate_response(self, query: str, context: List[Dict]) -> Dict[str, Any]:
+    def generate_response(self, query: str, context: List[Dict], intent: Optional[str] = None) -> Dict[str, Any]:
         """Generate response using RAG pattern"""
         # Extract relevant information
         relevant_texts = [item['content'] for item in context]
         combined_context = "\n\n".join(relevant_texts)
         
         # Create response template based on intent
-        intent = self.classify_intent(query)
+        if intent is None:
+            intent = self.classify_intent(query)
         
         response_template = f"""Based on the Cyber Laws, here's the information:
 
@@ -141,6 +205,7 @@ Answer: """
         for item in context:
             metadata = item['metadata']
             source_info = {
+                'chunk_id': metadata.get('chunk_id') or metadata.get('id'),
                 'title': metadata.get('filename', 'Unknown'),
                 'section': metadata.get('section_title', ''),
                 'confidence': round(item['score'] * 100, 2)
@@ -155,17 +220,56 @@ Answer: """
             'context_used': len(relevant_texts)
         }
     
-    def query(self, user_query: str) -> Dict[str, Any]:
-        """Main query method"""
-        # Classify intent
-        intent = self.classify_intent(user_query)
+    def query(self, user_query: str, cancelled: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Main query method, served from the answer cache when the corpus hasn't changed.
+        Setting `cancelled` stops the work at the next stage boundary with QueryCancelled.
+        """
+        key = normalize_query(user_query)
+        version = corpus_version.current()
         
-        # Search relevant documents
-        context = self.search_documents(user_query, intent)
+        cached = self._cached_answer(key, version)
+        if cached is not None:
+            return cached
         
-        # Generate response
+        response = self._query_uncached(user_query, cancelled)
+        self._cache_answer(key, version, response)
+        return dict(response)
+    
+    def _cached_answer(self, key: str, version: str) -> Optional[Dict[str, Any]]:
+        """A copy of the cached answer with this request's own timings, or None"""
+        start = time.perf_counter()
+        cached = self.answer_cache.get_versioned(key, version)
+        if cached is None:
+            return None
+        response = dict(cached)
+        response['timings'] = {'cache_hit': True, 'cache_ms': round((time.perf_counter() - start) * 1000, 3)}
+        return response
+    
+    def _cache_answer(self, key: str, version: str, response: Dict[str, Any]):
+        # Timings describe the request that computed the answer, not later hits
+        self.answer_cache.set_versioned(key, version, {k: v for k, v in response.items() if k != 'timings'})
+    
+    def _section_response(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """Answer explicit section references from the section index, or None"""
+        start = time.perf_counter()
+        try:
+            section_context = self.lookup_section(user_query)
+        except Exception as e:
+            print(f"Section lookup error: {e}")
+            section_context = []
+        if not section_context:
+            return None
+        response = self.generate_response(user_query, section_context, intent='section')
+        # No intent classification ran, but callers expect the same keys as other answers
+        response['intent_similarity'] = None
+        response['timings'] = {'section_index_ms': round((time.perf_counter() - start) * 1000, 3)}
+        return response
+    
+    def _build_response(self, user_query: str, context: List[Dict], intent: str,
+                        intent_similarity: float, timings: Dict[str, Any]) -> Dict[str, Any]:
         if context:
-            response = self.generate_response(user_query, context)
+            response = self.generate_response(user_query, context, intent=intent)
         else:
             response = {
                 'answer': "I couldn't find specific information on that topic in the cyber laws database. Please try rephrasing your question or contact legal authorities for specific queries.",
@@ -175,4 +279,104 @@ Answer: """
                 'context_used': 0
             }
         
-        return response
\ No newline at end of file
+        response['intent_similarity'] = intent_similarity
+        response['timings'] = timings
+        return response
+    
+    @staticmethod
+    def _check_cancelled(cancelled: Optional[threading.Event]):
+        if cancelled is not None and cancelled.is_set():
+            raise QueryCancelled()
+    
+    def _query_uncached(self, user_query: str, cancelled: Optional[threading.Event] = None) -> Dict[str, Any]:
+        # Explicit section references are answered from the section index
+        response = self._section_response(user_query)
+        if response is not None:
+            return response
+        
+        # One embedding serves both intent classification and retrieval
+        self._check_cancelled(cancelled)
+        query_embedding = self.vector_store.embed_query(user_query)
+        intent, intent_similarity = self.classify_intents([query_embedding])[0]
+        
+        # Search relevant documents
+        self._check_cancelled(cancelled)
+        try:
+            context, timings = self.retrieve(
+                user_query, intent, query_embedding=query_embedding, cancelled=cancelled
+            )
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            print(f"Search error: {e}")
+            context, timings = [], {}
+        
+        return self._build_response(user_query, context, intent, intent_similarity, timings)
+    
+    def query_batch(self, queries: List[str], top_k: int = 5,
+                    cancelled: Optional[threading.Event] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Answer many queries at once, yielding (position, response) in completion order.
+        Cached answers and section lookups come back first; the rest are embedded in
+        one encode call, classified with one matrix multiply, and searched on the
+        batch retrieval pool, BATCH_RETRIEVAL_WORKERS queries at a time.
+        Setting `cancelled` stops the batch with QueryCancelled.
+        """
+        version = corpus_version.current()
+        pending = []
+        for position, user_query in enumerate(queries):
+            self._check_cancelled(cancelled)
+            key = normalize_query(user_query)
+            cached = self._cached_answer(key, version)
+            if cached is not None:
+                yield position, cached
+                continue
+            response = self._section_response(user_query)
+            if response is not None:
+                self._cache_answer(key, version, response)
+                yield position, dict(response)
+                continue
+            pending.append((position, user_query))
+        
+        if not pending:
+            return
+        
+        self._check_cancelled(cancelled)
+        embeddings = self.vector_store.embed_queries([user_query for _, user_query in pending])
+        intents = self.classify_intents(embeddings)
+        
+        remaining = iter(zip(pending, embeddings, intents))
+        in_flight = {}
+        
+        def submit_next():
+            for (position, user_query), embedding, (intent, similarity) in remaining:
+                start = time.perf_counter()
+                vector_future, lexical_future = self._submit_retrieval(
+                    user_query, intent, top_k, None, embedding, pool=self.batch_retrieval_pool
+                )
+                in_flight[vector_future] = (position, user_query, intent, similarity, lexical_future, start)
+                return
+        
+        for _ in range(max(1, self.config.BATCH_RETRIEVAL_WORKERS)):
+            submit_next()
+        
+        try:
+            while in_flight:
+                self._check_cancelled(cancelled)
+                done, _ = wait(in_flight, timeout=0.05, return_when=FIRST_COMPLETED)
+                for vector_future in done:
+                    position, user_query, intent, similarity, lexical_future, start = in_flight.pop(vector_future)
+                    try:
+                        context, timings = self._collect_retrieval(vector_future, lexical_future, top_k, start)
+                    except Exception as e:
+                        print(f"Search error: {e}")
+                        context, timings = [], {}
+                    response = self._build_response(user_query, context, intent, similarity, timings)
+                    self._cache_answer(normalize_query(user_query), version, response)
+                    submit_next()
+                    yield position, dict(response)
+        finally:
+            # Cancelled or abandoned: don't leave searches queued on the pool
+            for vector_future, (_, _, _, _, lexical_future, _) in in_flight.items():
+                vector_future.cancel()
+                lexical_future.cancel()
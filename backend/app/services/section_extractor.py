@@ -0,0 +1,97 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Any
+
+# Section headers in Indian cyber law texts. Lines are lowercased once and
+# matched case-sensitively against one alternation, which lets the regex
+# engine skip ahead on literal prefixes instead of retrying four
+# case-insensitive patterns at every position.
+SECTION_HEADER_PATTERNS = [
+    r'it\s+act,\s*2000',
+    r'information\s+technology\s+act,\s*2000',
+    r'section\s+\d+[a-z]*\s*[:\.]?\s*.+',
+    r'cyber\s+crime|cyber\s+security|data\s+protection|digital\s+signature',
+]
+SECTION_HEADER_PATTERN = re.compile("|".join(SECTION_HEADER_PATTERNS))
+
+# Numbered sections ('12. Penalty ...') are only recognised at the start of a line
+NUMBERED_HEADER_PATTERN = re.compile(r'\s*\d+[\.\)]\s+.+$')
+
+
+def is_section_header(line: str, line_lower: str) -> bool:
+    return bool(NUMBERED_HEADER_PATTERN.match(line) or SECTION_HEADER_PATTERN.search(line_lower))
+
+
+class KeywordMatcher:
+    """
+    Finds every dictionary keyword occurring in a text in one pass.
+
+    All keywords go into a single lookahead alternation, longest first, so
+    the regex engine reports the longest keyword starting at each position.
+    Shorter keywords that are prefixes of it also match there; they are
+    precomputed per keyword, like the output links of an Aho-Corasick
+    automaton. Results are in dictionary order, as the substring scan gave.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = list(dict.fromkeys(k.lower() for k in keywords if k))
+        self._order = {keyword: i for i, keyword in enumerate(self.keywords)}
+        self._prefixes = {
+            keyword: [other for other in self.keywords if other != keyword and keyword.startswith(other)]
+            for keyword in self.keywords
+        }
+        by_length = sorted(self.keywords, key=len, reverse=True)
+        self._pattern = (
+            re.compile("(?=(" + "|".join(re.escape(k) for k in by_length) + "))")
+            if by_length else None
+        )
+
+    def find(self, text: str) -> List[str]:
+        return self.find_lower(text.lower())
+
+    def find_lower(self, text_lower: str) -> List[str]:
+        """find() for text the caller has already lowercased"""
+        if self._pattern is None:
+            return []
+        found = set()
+        for match in self._pattern.finditer(text_lower):
+            keyword = match.group(1)
+            found.add(keyword)
+            found.update(self._prefixes[keyword])
+        return sorted(found, key=self._order.__getitem__)
+
+
+class SectionExtractor:
+    """Splits a stream of lines into header-delimited sections with keywords"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keyword_matcher = KeywordMatcher(keywords)
+
+    def iter_sections(self, lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Yield each section as soon as the next header closes it"""
+        current_section = None
+        content_parts = []
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            line_lower = line.lower()
+            if is_section_header(line, line_lower):
+                if current_section:
+                    current_section['content'] = ''.join(content_parts)
+                    yield current_section
+
+                current_section = {
+                    'title': line,
+                    'content': '',
+                    'type': 'section',
+                    'keywords': self.keyword_matcher.find_lower(line_lower)
+                }
+                content_parts = []
+            elif current_section:
+                content_parts.append(line + ' ')
+
+        if current_section:
+            current_section['content'] = ''.join(content_parts)
+            yield current_section
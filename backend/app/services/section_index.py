@@ -0,0 +1,137 @@
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.document import SectionReference
+from app.services.corpus_version import section_index_version
+
+# Same header shape extract_cyber_law_sections detects
+SECTION_NUMBER_PATTERN = re.compile(r'SECTION\s+(\d+[A-Z]*)', re.IGNORECASE)
+QUERY_SECTION_PATTERN = re.compile(r'\b(?:SECTION|SEC\.?|S\.)\s*(\d+[A-Z]*)\b', re.IGNORECASE)
+ACT_PATTERN = re.compile(r'\b((?:[A-Za-z]+\s+){0,4}?Act)\b', re.IGNORECASE)
+
+ACT_STOPWORDS = {"the", "of", "under", "in", "section", "sec", "what", "is", "explain", "per", "as", "to", "for",
+                 "this", "that", "said"}
+
+# Common spellings of the same Act
+ACT_ALIASES = {
+    "information technology act": "it act",
+    "i t act": "it act",
+    "it act": "it act",
+}
+
+
+def normalize_section_number(number: str) -> str:
+    return number.strip().lower()
+
+
+def normalize_act(text: Optional[str]) -> str:
+    """'Information Technology Act, 2000' -> 'it act'; '' when no Act is named"""
+    if not text:
+        return ""
+    match = ACT_PATTERN.search(text)
+    if not match:
+        return ""
+    words = re.sub(r"[^a-z ]", " ", match.group(1).lower()).split()
+    # Keep only the words after the last connective: 'penalty under the companies act' -> 'companies act'
+    for i in range(len(words) - 1, -1, -1):
+        if words[i] in ACT_STOPWORDS:
+            words = words[i + 1:]
+            break
+    act = " ".join(words)
+    # 'this Act', 'the said Act': refers back to some Act without naming it
+    if act == "act":
+        return ""
+    for alias, canonical in ACT_ALIASES.items():
+        if act == alias or act.endswith(" " + alias):
+            return canonical
+    return act
+
+
+def parse_section_header(title: str) -> Optional[str]:
+    """Normalized section number from a section header line, if it has one"""
+    match = SECTION_NUMBER_PATTERN.search(title)
+    return normalize_section_number(match.group(1)) if match else None
+
+
+def parse_section_reference(query: str) -> Optional[Tuple[str, str]]:
+    """(act, section number) from queries like 'What is Section 43A of the IT Act?'"""
+    match = QUERY_SECTION_PATTERN.search(query)
+    if not match:
+        return None
+    return normalize_act(query), normalize_section_number(match.group(1))
+
+
+def _bump_version_on_commit(db: Session):
+    # After the commit, so readers that reload straight away see the new rows
+    event.listen(db, "after_commit", lambda session: section_index_version.bump(), once=True)
+
+
+def replace_section_references(db: Session, document_id: int, references: List[Dict]):
+    """Swap a document's index entries for a freshly ingested set (caller commits)"""
+    _bump_version_on_commit(db)
+    db.query(SectionReference).filter(SectionReference.document_id == document_id).delete(synchronize_session=False)
+    db.bulk_insert_mappings(SectionReference, [
+        {**reference, "document_id": document_id} for reference in references
+    ])
+
+
+def delete_section_references(db: Session, document_id: int):
+    """Remove a document's index entries (caller commits)"""
+    _bump_version_on_commit(db)
+    db.query(SectionReference).filter(SectionReference.document_id == document_id).delete(synchronize_session=False)
+
+
+class SectionIndex:
+    """
+    In-memory (act, section number) -> chunk ids map, loaded from the
+    section_references table and reloaded when section_index_version changes
+    (only writes to that table bump it, not every chunk write).
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._by_act: Dict[Tuple[str, str], List[str]] = {}
+        self._by_section: Dict[str, List[str]] = {}
+
+    def _refresh(self):
+        version = section_index_version.current()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            by_act = defaultdict(list)
+            by_section = defaultdict(list)
+            db = self.session_factory()
+            try:
+                rows = db.query(
+                    SectionReference.act, SectionReference.section_number, SectionReference.chunk_id
+                ).order_by(SectionReference.document_id.desc(), SectionReference.id).all()
+            finally:
+                db.close()
+            for act, section_number, chunk_id in rows:
+                by_act[(act, section_number)].append(chunk_id)
+                by_section[section_number].append(chunk_id)
+            self._by_act, self._by_section = dict(by_act), dict(by_section)
+            self._version = version
+
+    def lookup(self, act: str, section_number: str, limit: int = 5) -> List[str]:
+        """
+        Chunk ids for the section. A named Act is matched exactly, falling back to
+        entries whose Act is unknown; with no Act named, any Act's section matches.
+        """
+        self._refresh()
+        if act:
+            chunk_ids = self._by_act.get((act, section_number)) or self._by_act.get(("", section_number), [])
+        else:
+            chunk_ids = self._by_section.get(section_number, [])
+        return chunk_ids[:limit]
+
+    def __len__(self):
+        return len(self._by_act)
@@ -0,0 +1,424 @@
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+from app.config import settings
+from app.services.corpus_version import corpus_version
+
+# Full-text search in LanceDB needs tantivy; without it lexical retrieval is disabled
+try:
+    import tantivy
+except ImportError:
+    tantivy = None
+
+
+class VectorIndexManager:
+    """
+    Lifecycle of the IVF-PQ index on a LanceDB table.
+
+    Below VECTOR_INDEX_MIN_ROWS the table is searched brute force. Once it
+    grows past that, the index is built in a background thread of an
+    ingestion worker, and rebuilt once the rows upserted or deleted since the
+    last build reach VECTOR_INDEX_REBUILD_DRIFT of what it was trained on.
+    Build state lives in files next to the table so the web and ingestion
+    processes agree on it.
+    """
+
+    def __init__(self, vector_store, state_path: str):
+        self.vector_store = vector_store
+        self.state_path = state_path
+        self.lock_path = state_path + ".lock"
+        # Holds the time chunks first changed since the last BM25 rebuild; touched on every change
+        self.lexical_stale_path = state_path + ".fts_stale"
+        # One line per write: the number of rows it upserted or deleted since the last build
+        self.changes_path = state_path + ".changes"
+        # Present when an admin asked for a rebuild; the next worker to check runs it
+        self.build_requested_path = state_path + ".build_requested"
+        self._thread: Optional[threading.Thread] = None
+        self._state_signature = None
+        self._state: Dict[str, Any] = {}
+        self.last_error: Optional[str] = None
+
+    # Shared state
+
+    def state(self) -> Dict[str, Any]:
+        try:
+            stat = os.stat(self.state_path)
+        except FileNotFoundError:
+            return {}
+        # The file is always replaced, so a new inode marks a write within one mtime tick
+        signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        if signature != self._state_signature:
+            try:
+                with open(self.state_path, "r") as f:
+                    self._state = json.load(f)
+                self._state_signature = signature
+            except (OSError, ValueError):
+                return self._state
+        return self._state
+
+    def _write_state(self, state: Dict[str, Any]):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.state_path)),
+                                         prefix=".index_state.", suffix=".tmp")
+        # mkstemp creates it 0600; the other services' processes must be able to read it
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def is_indexed(self) -> bool:
+        return bool(self.state().get("built_at"))
+
+    # Build scheduling
+
+    def row_count(self) -> int:
+        table = self.vector_store.table
+        return table.count_rows() if table is not None else 0
+
+    def record_changes(self, rows: int):
+        """Count rows upserted or deleted, for drift; appends are atomic across processes"""
+        if rows <= 0:
+            return
+        fd = os.open(self.changes_path, os.O_CREAT | os.O_WRONLY | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, f"{rows}\n".encode())
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _sum_changes(path: str) -> int:
+        try:
+            with open(path, "r") as f:
+                return sum(int(line) for line in f if line.strip().isdigit())
+        except FileNotFoundError:
+            return 0
+
+    def changes_since_build(self) -> int:
+        return self._sum_changes(self.changes_path)
+
+    def _take_changes(self) -> int:
+        """Reset the change count at the start of a build; returns what it was"""
+        snapshot = self.changes_path + ".building"
+        try:
+            os.replace(self.changes_path, snapshot)
+        except FileNotFoundError:
+            return 0
+        changes = self._sum_changes(snapshot)
+        os.remove(snapshot)
+        return changes
+
+    def drift(self) -> float:
+        """Rows changed since the last build, as a fraction of the rows it was trained on"""
+        rows_at_build = self.state().get("rows_at_build")
+        if not rows_at_build:
+            return 1.0
+        return self.changes_since_build() / rows_at_build
+
+    def request_build(self):
+        """Ask the ingestion workers to rebuild the index (see maybe_schedule)"""
+        with open(self.build_requested_path, "w") as f:
+            f.write(str(time.time()))
+
+    def build_requested(self) -> bool:
+        return os.path.exists(self.build_requested_path)
+
+    def needs_build(self) -> bool:
+        if self.build_requested():
+            return True
+        rows = self.row_count()
+        if rows < settings.VECTOR_INDEX_MIN_ROWS:
+            return False
+        return not self.is_indexed() or self.drift() >= settings.VECTOR_INDEX_REBUILD_DRIFT
+
+    def maybe_schedule(self) -> bool:
+        """
+        Start a background build if one is due (or was requested) and none is
+        running; returns True if started. Only ingestion workers call this, so
+        builds never compete with queries in the web process.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        if not self.needs_build():
+            return False
+
+        self._thread = threading.Thread(target=self._build_with_lock, name="vector-index-build", daemon=True)
+        self._thread.start()
+        return True
+
+    def _acquire_lock(self) -> bool:
+        # Only one process builds at a time; a lock older than the timeout is from a dead builder
+        try:
+            if time.time() - os.stat(self.lock_path).st_mtime > settings.VECTOR_INDEX_BUILD_TIMEOUT_SECONDS:
+                os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            return True
+        except FileExistsError:
+            return False
+
+    def _release_lock(self):
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _build_with_lock(self):
+        if not self._acquire_lock():
+            return
+        try:
+            # Taken under the lock, so each request starts exactly one build
+            if self.build_requested():
+                os.remove(self.build_requested_path)
+            self.build()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Vector index build failed: {e}")
+        finally:
+            self._release_lock()
+
+    def build(self):
+        """Train the IVF-PQ index over the current table (replacing any existing one)"""
+        table = self.vector_store.table
+        rows = table.count_rows()
+        dim = self.vector_store.embedding_model.get_sentence_embedding_dimension()
+
+        num_partitions = settings.VECTOR_INDEX_NUM_PARTITIONS or max(1, int(math.sqrt(rows)))
+        num_sub_vectors = settings.VECTOR_INDEX_NUM_SUB_VECTORS or self._default_sub_vectors(dim)
+
+        start = time.perf_counter()
+        # Writes during the build count towards the next one
+        changes = self._take_changes()
+        try:
+            table.create_index(
+                metric="L2",
+                num_partitions=num_partitions,
+                num_sub_vectors=num_sub_vectors,
+                vector_column_name="embedding",
+                replace=True
+            )
+        except Exception:
+            self.record_changes(changes)
+            raise
+        scalar_indexes = self._build_scalar_indexes(table)
+        state = dict(self.state())
+        state.update({
+            "index_type": "IVF_PQ",
+            "scalar_indexes": scalar_indexes,
+            "scalar_built_at": datetime.utcnow().isoformat(),
+            "built_at": datetime.utcnow().isoformat(),
+            "build_seconds": round(time.perf_counter() - start, 2),
+            "rows_at_build": rows,
+            "num_partitions": num_partitions,
+            "num_sub_vectors": num_sub_vectors
+        })
+        self._write_state(state)
+        self.last_error = None
+        print(f"Built IVF-PQ index over {rows} rows ({num_partitions} partitions)")
+
+    @staticmethod
+    def _build_scalar_indexes(table) -> List[str]:
+        """BTREE indexes on the columns search filters use most, so prefilters don't scan"""
+        built = []
+        columns = set(table.schema.names)
+        for column in settings.SCALAR_INDEX_COLUMNS:
+            if column not in columns:
+                continue
+            try:
+                table.create_scalar_index(column, replace=True)
+                built.append(column)
+            except Exception as e:
+                print(f"Scalar index on {column} failed: {e}")
+        return built
+
+    @staticmethod
+    def _default_sub_vectors(dim: int) -> int:
+        # PQ needs dim divisible by the sub-vector count; aim for 8 dims per sub-vector
+        for candidate in (dim // 8, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+            if candidate > 0 and dim % candidate == 0:
+                return candidate
+        return 1
+
+    # Full-text (BM25) index over chunk text
+
+    def lexical_available(self) -> bool:
+        return tantivy is not None and bool(self.state().get("fts_built_at"))
+
+    def mark_lexical_stale(self):
+        """Record that chunks changed; an ingestion worker rebuilds the BM25 index later"""
+        while True:
+            try:
+                fd = os.open(self.lexical_stale_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(time.time()).encode())
+                os.close(fd)
+                return
+            except FileExistsError:
+                try:
+                    os.utime(self.lexical_stale_path)
+                    return
+                except FileNotFoundError:
+                    continue  # a rebuild just cleared it
+
+    def refresh_lexical_index_if_due(self, idle: bool) -> bool:
+        """
+        Rebuild the BM25 index, and refresh the scalar indexes, if chunks changed
+        since the last rebuild. Scalar indexes don't wait for VECTOR_INDEX_MIN_ROWS
+        like the ANN index: filtered searches benefit at any size. Workers call
+        this when their queue is empty, so a burst of jobs costs one rebuild;
+        a queue that never empties still gets one every LEXICAL_INDEX_MAX_DELAY_SECONDS.
+        Runs under the build lock, so only one process rebuilds at a time.
+        Returns True if it rebuilt.
+        """
+        try:
+            with open(self.lexical_stale_path, "r") as f:
+                first_marked = float(f.read() or 0)
+        except FileNotFoundError:
+            return False
+        except ValueError:
+            first_marked = 0.0
+        if not idle and time.time() - first_marked < settings.LEXICAL_INDEX_MAX_DELAY_SECONDS:
+            return False
+        if not self._acquire_lock():
+            return False
+
+        try:
+            try:
+                marked_ns = os.stat(self.lexical_stale_path).st_mtime_ns
+            except FileNotFoundError:
+                return False
+            self._refresh_lexical_index()
+            self._refresh_scalar_indexes()
+            # Changes marked while the rebuild ran need another one
+            if os.stat(self.lexical_stale_path).st_mtime_ns == marked_ns:
+                os.remove(self.lexical_stale_path)
+        finally:
+            self._release_lock()
+        return True
+
+    def _refresh_lexical_index(self):
+        """
+        Rebuild the BM25 index over chunk text (the pinned LanceDB FTS index is
+        not incremental). Callers hold the build lock, which also guards the state file.
+        """
+        table = self.vector_store.table
+        if tantivy is None or table is None:
+            return
+
+        start = time.perf_counter()
+        table.create_fts_index("text", replace=True)
+        state = dict(self.state())
+        state.update({
+            "fts_built_at": datetime.utcnow().isoformat(),
+            "fts_build_seconds": round(time.perf_counter() - start, 2)
+        })
+        self._write_state(state)
+        # Answers cached while keyword search lagged behind the chunks are stale now
+        corpus_version.bump()
+
+    def _refresh_scalar_indexes(self):
+        """Rebuild the scalar indexes so rows added since the last build are covered (callers hold the lock)"""
+        table = self.vector_store.table
+        if table is None:
+            return
+        state = dict(self.state())
+        state.update({
+            "scalar_indexes": self._build_scalar_indexes(table),
+            "scalar_built_at": datetime.utcnow().isoformat()
+        })
+        self._write_state(state)
+
+    # Query side
+
+    def apply_search_params(self, query):
+        """Add the nprobes/refine_factor tuning knobs once an index exists"""
+        if self.is_indexed():
+            query = query.nprobes(settings.VECTOR_SEARCH_NPROBES)
+            if settings.VECTOR_SEARCH_REFINE_FACTOR:
+                query = query.refine_factor(settings.VECTOR_SEARCH_REFINE_FACTOR)
+        return query
+
+    def measure_recall(self, sample_size: int = 20, k: int = 10) -> Dict[str, Any]:
+        """
+        Recall@k of the indexed search against exact search, using vectors
+        sampled from the table itself as queries
+        """
+        table = self.vector_store.table
+        if table is None:
+            return {"sample_size": 0, "k": k, "recall": None}
+
+        dataset = table.to_lance()
+        total = dataset.count_rows()
+        if total == 0:
+            return {"sample_size": 0, "k": k, "recall": None}
+
+        rng = np.random.default_rng()
+        indices = sorted(rng.choice(total, size=min(sample_size, total), replace=False).tolist())
+        sample = dataset.take(indices, columns=["embedding"]).to_pydict()["embedding"]
+        queries = np.asarray(sample, dtype=np.float32)
+
+        exact = self._exact_neighbours(dataset, queries, k)
+        recalls = []
+        approx_ms = []
+        for query_vector, exact_ids in zip(queries, exact):
+            start = time.perf_counter()
+            results = self.apply_search_params(table.search(query_vector.tolist()).limit(k)).to_list()
+            approx_ms.append((time.perf_counter() - start) * 1000)
+            approx_ids = {row["id"] for row in results}
+            recalls.append(len(approx_ids & set(exact_ids)) / max(len(exact_ids), 1))
+
+        return {
+            "sample_size": len(queries),
+            "k": k,
+            "recall": round(float(np.mean(recalls)), 4),
+            "avg_search_ms": round(float(np.mean(approx_ms)), 2)
+        }
+
+    @staticmethod
+    def _exact_neighbours(dataset, queries: np.ndarray, k: int) -> List[List[str]]:
+        """Brute-force L2 top-k over the whole table, streamed in record batches"""
+        best_dist = np.full((len(queries), 0), np.inf, dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=object)
+
+        for batch in dataset.to_batches(columns=["id", "embedding"]):
+            batch_dict = batch.to_pydict()
+            if not batch_dict["id"]:
+                continue
+            vectors = np.asarray(batch_dict["embedding"], dtype=np.float32)
+            ids = np.asarray(batch_dict["id"], dtype=object)
+            dist = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+
+            all_dist = np.concatenate([best_dist, dist], axis=1)
+            all_ids = np.concatenate([best_ids, np.broadcast_to(ids, dist.shape)], axis=1)
+            keep = np.argsort(all_dist, axis=1)[:, :k]
+            best_dist = np.take_along_axis(all_dist, keep, axis=1)
+            best_ids = np.take_along_axis(all_ids, keep, axis=1)
+
+        return best_ids.tolist()
+
+    def status(self) -> Dict[str, Any]:
+        rows = self.row_count()
+        return {
+            "row_count": rows,
+            "indexed": self.is_indexed(),
+            "min_rows": settings.VECTOR_INDEX_MIN_ROWS,
+            "changes_since_build": self.changes_since_build(),
+            "drift": round(self.drift(), 4) if self.is_indexed() else None,
+            "rebuild_drift": settings.VECTOR_INDEX_REBUILD_DRIFT,
+            "build_requested": self.build_requested(),
+            "build_in_progress": os.path.exists(self.lock_path),
+            "nprobes": settings.VECTOR_SEARCH_NPROBES,
+            "refine_factor": settings.VECTOR_SEARCH_REFINE_FACTOR,
+            "lexical_available": self.lexical_available(),
+            "lexical_stale": os.path.exists(self.lexical_stale_path),
+            "last_error": self.last_error,
+            **{key: value for key, value in self.state().items()}
+        }
@@ -1,47 +1,277 @@
 import lancedb
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
-import pandas as pd
+from datetime import timedelta
+from typing import List, Dict, Any, Optional
+import pyarrow as pa
 import os
+import re
+import numpy as np
+
+from app.config import settings
+from app.services.embedding_registry import get_embedding_model
+from app.services.embedding_cache import query_embedding_cache
+from app.services.batch_encoder import get_query_encoder
+from app.services.corpus_version import corpus_version
+from app.services.vector_index import VectorIndexManager
 
 class VectorStoreManager:
-    def __init__(self, db_path="./data/lancedb", table_name="documents"):
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.db = lancedb.connect(db_path)
+    def __init__(self, db_path="./data/lancedb", table_name="documents", model_name=None):
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.embedding_model = get_embedding_model(self.model_name)
+        # Ingestion workers write through their own connections, so reads must pick up newer versions
+        self.db = lancedb.connect(
+            db_path,
+            read_consistency_interval=timedelta(seconds=settings.VECTOR_STORE_READ_CONSISTENCY_SECONDS)
+        )
         self.table_name = table_name
-        # Create table if it doesn't exist
-        try:
-            self.table = self.db.open_table(table_name)
-        except:
-            self.table = None
+        self._table = None
+        
+        self.index_manager = VectorIndexManager(self, os.path.join(db_path, f"{table_name}_index.json"))
 
+    @property
+    def table(self):
+        """The LanceDB table, opened on first use (and retried until another process creates it)"""
+        if self._table is None:
+            try:
+                self._table = self.db.open_table(self.table_name)
+            except Exception:
+                return None
+        return self._table
+    
+    @table.setter
+    def table(self, table):
+        self._table = table
+    
     def add_documents(self, documents: List[str], metadatas: List[Dict]):
         # Generate embeddings
         embeddings = self.embedding_model.encode(documents).tolist()
-        
-        # Prepare data for LanceDB
+        return self.add_embeddings(documents, metadatas, embeddings)
+    
+    @staticmethod
+    def make_chunk_id(document_id, chunk_index) -> str:
+        """Stable id for a chunk, so re-processing replaces rows instead of duplicating them"""
+        return f"{document_id}_chunk_{chunk_index}"
+    
+    def schema(self) -> pa.Schema:
+        """
+        Column types of the chunk table. Declared up front because inferring
+        them from the first batch types an all-empty column as null (keywords
+        become list<null>) and later batches then fail to merge.
+        """
+        dim = self.embedding_model.get_sentence_embedding_dimension()
+        return pa.schema([
+            pa.field("id", pa.string(), nullable=False),
+            pa.field("embedding", pa.list_(pa.float32(), dim)),
+            pa.field("text", pa.string()),
+            pa.field("document_id", pa.int64()),
+            pa.field("source", pa.string()),
+            pa.field("document_type", pa.string()),
+            pa.field("uploaded_by", pa.string()),
+            pa.field("section_title", pa.string()),
+            pa.field("keywords", pa.list_(pa.string())),
+            pa.field("chunk_index", pa.int64()),
+            pa.field("chunk_id", pa.string()),
+            pa.field("word_count", pa.int64()),
+            pa.field("char_count", pa.int64()),
+            pa.field("content_hash", pa.string()),
+        ])
+    
+    def _to_arrow(self, documents: List[str], metadatas: List[Dict], embeddings: List[List[float]],
+                  schema: pa.Schema) -> pa.Table:
+        """Rows for the chunk table; metadata fields outside the schema are dropped"""
         data = []
         for i, (doc, meta, emb) in enumerate(zip(documents, metadatas, embeddings)):
+            chunk_id = meta.get("chunk_id") or self.make_chunk_id(meta.get("document_id", ""), meta.get("chunk_index", i))
             data.append({
-                "id": i,
+                **meta,  # Add all metadata fields
+                "id": chunk_id,
                 "text": doc,
-                "embedding": emb,
-                **meta  # Add all metadata fields
+                "embedding": emb
             })
+        return pa.Table.from_pylist(data, schema=schema)
+    
+    def add_embeddings(self, documents: List[str], metadatas: List[Dict], embeddings: List[List[float]]):
+        """Write pre-computed embeddings (used by the streaming ingestion pipeline)"""
+        return self.upsert_documents(documents, metadatas, embeddings)
+    
+    def upsert_documents(self, documents: List[str], metadatas: List[Dict], embeddings: List[List[float]]):
+        """Insert chunks, replacing any existing rows with the same chunk id"""
+        if self.table is None:
+            # exist_ok: another worker may create it first
+            self.table = self.db.create_table(self.table_name, schema=self.schema(), exist_ok=True)
+        rows = self._to_arrow(documents, metadatas, embeddings, self.table.schema)
         
-        df = pd.DataFrame(data)
+        (self.table.merge_insert("id")
+            .when_matched_update_all()
+            .when_not_matched_insert_all()
+            .execute(rows))
+        self.index_manager.record_changes(rows.num_rows)
         
+        # New chunks are searchable, so cached answers are stale
+        corpus_version.bump()
+        
+        return rows.num_rows
+    
+    def delete_document(self, document_id: int):
+        """Remove every chunk of a document (callers refresh the BM25 index afterwards)"""
         if self.table is None:
-            self.table = self.db.create_table(self.table_name, data=df)
-        else:
-            self.table.add(df)
+            return
+        where = f"document_id = {int(document_id)}"
+        deleted = self.table.count_rows(where)
+        self.table.delete(where)
+        self.index_manager.record_changes(deleted)
+        corpus_version.bump()
+    
+    def reset(self):
+        """Drop the chunk table and its index state (see app/database/schema_upgrades.py)"""
+        if self.table is not None:
+            self.db.drop_table(self.table_name)
+        self._table = None
+        index_manager = self.index_manager
+        for path in (index_manager.state_path, index_manager.lexical_stale_path, index_manager.changes_path):
+            if os.path.exists(path):
+                os.remove(path)
+        corpus_version.bump()
+    
+    def get_embeddings_by_hash(self, document_id: int) -> Dict[str, List[float]]:
+        """Map content_hash -> embedding for every chunk of a document"""
+        if self.table is None or "content_hash" not in self.table.schema.names:
+            return {}
+        
+        rows = self.table.to_lance().to_table(
+            columns=["content_hash", "embedding"],
+            filter=f"document_id = {int(document_id)}"
+        ).to_pylist()
+        return {row["content_hash"]: row["embedding"] for row in rows if row["content_hash"]}
+    
+    def get_chunks(self, chunk_ids: List[str]) -> List[Dict]:
+        """Fetch chunk rows by id, in the order given"""
+        if self.table is None or not chunk_ids:
+            return []
         
-        return len(data)
+        id_list = ", ".join("'" + str(chunk_id).replace("'", "''") + "'" for chunk_id in chunk_ids)
+        rows = self.table.to_lance().to_table(filter=f"id IN ({id_list})").to_pylist()
+        by_id = {row["id"]: row for row in rows}
+        return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
     
-    def search(self, query: str, n_results: int = 5):
-        # Generate query embedding
-        query_embedding = self.embedding_model.encode([query]).tolist()[0]
+    def embed_query(self, query: str):
+        # Repeated questions skip the encoder entirely
+        embedding = query_embedding_cache.get(self.model_name, query)
+        if embedding is None:
+            # Concurrent queries share one batched encode call
+            embedding = get_query_encoder(self.model_name).encode(query)
+            query_embedding_cache.set(self.model_name, query, embedding)
+        return embedding
+    
+    def embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """Embed a batch of queries with one encode call for the cache misses"""
+        embeddings = [query_embedding_cache.get(self.model_name, query) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            # Already a batch, so skip the micro-batcher and call the model directly
+            encoded = self.embedding_model.encode(
+                [queries[i] for i in missing],
+                batch_size=settings.ENCODER_MAX_BATCH_SIZE
+            )
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+                query_embedding_cache.set(self.model_name, queries[i], embedding)
+        return embeddings
+    
+    @staticmethod
+    def build_where(filters: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Turn structured filters into a LanceDB SQL predicate.
+        Supported keys: document_id, document_type, source (a value or a list) and has_section.
+        Superseded versions are deleted on re-ingest, so every row belongs to an active document.
+        """
+        if not filters:
+            return None
+        
+        def literal(value):
+            if isinstance(value, bool):
+                return "TRUE" if value else "FALSE"
+            if isinstance(value, (int, float)):
+                return str(value)
+            return "'" + str(value).replace("'", "''") + "'"
+        
+        clauses = []
+        for column in ("document_id", "document_type", "source"):
+            value = filters.get(column)
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                if not value:
+                    return "FALSE"
+                clauses.append(f"{column} IN ({', '.join(literal(v) for v in value)})")
+            else:
+                clauses.append(f"{column} = {literal(value)}")
+        
+        if filters.get("has_section") is True:
+            clauses.append("section_title IS NOT NULL AND section_title != ''")
+        elif filters.get("has_section") is False:
+            clauses.append("(section_title IS NULL OR section_title = '')")
+        
+        return " AND ".join(clauses) or None
+    
+    def search(self, query: str, n_results: int = 5, filters: Optional[Dict[str, Any]] = None,
+               query_embedding=None):
+        if self.table is None:
+            return []
+        
+        # Generate query embedding (unless the caller already has it)
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        query_embedding = np.asarray(query_embedding, dtype=np.float32).tolist()
+        
+        # Filters restrict the candidates before the distance computation
+        query_builder = self.table.search(query_embedding)
+        where = self.build_where(filters)
+        if where:
+            query_builder = query_builder.where(where, prefilter=True)
         
         # Perform the search
-        results = self.table.search(query_embedding).limit(n_results).to_pandas()
-        return results.to_dict('records')
\ No newline at end of file
+        query_builder = self.index_manager.apply_search_params(query_builder.limit(n_results))
+        results = query_builder.to_pandas()
+        return results.to_dict('records')
+    
+    def lexical_search(self, query: str, n_results: int = 10, filters: Optional[Dict[str, Any]] = None,
+                       query_embedding=None):
+        """
+        BM25 search over chunk text. Results carry a '_distance' computed from the
+        query embedding so they score on the same scale as vector hits.
+        """
+        if self.table is None or not self.index_manager.lexical_available():
+            return []
+        
+        # Strip characters the tantivy query parser treats as syntax
+        terms = re.sub(r"[^\w\s]", " ", query).strip()
+        if not terms:
+            return []
+        
+        query_builder = self.table.search(terms, query_type="fts")
+        where = self.build_where(filters)
+        if where:
+            query_builder = query_builder.where(where)
+        results = query_builder.limit(n_results).to_list()
+        
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        for result in results:
+            embedding = np.asarray(result.get("embedding"), dtype=np.float32)
+            result["_distance"] = float(((embedding - query_embedding) ** 2).sum())
+        return results
+
+_vector_store = None
+
+
+def get_vector_store() -> VectorStoreManager:
+    """Process-wide VectorStoreManager for the cyber_laws table"""
+    global _vector_store
+    if _vector_store is None:
+        _vector_store = VectorStoreManager(
+            db_path=os.path.join(settings.VECTOR_STORE_PATH, "lancedb"),
+            table_name="cyber_laws",
+            model_name=settings.EMBEDDING_MODEL
+        )
+    return _vector_store
@@ -1,15 +1,199 @@
 import json
+import queue
+from collections import deque
+import threading
+import time
 from datetime import datetime
-from typing import Optional, Dict, Any
-from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any, List
 from fastapi import Request
 
-from app.database.session import SessionLocal
-from app.models.document import AuditLog
+from app.config import settings
+from app.database import audit_partitions
+from app.database.session import SessionLocal, engine
+from app.models.document import AuditLog, ChatMessage
+from app.utils import metrics
+
+_STOP = object()
+
+class AuditWriter:
+    """
+    Process-wide audit sink. log() calls put rows on a bounded in-memory
+    queue and a background thread writes them with bulk inserts, once
+    batch_size rows are waiting or flush_interval_ms has passed. Chat
+    history rows (ChatMessage) share the same queue and flushes.
+    
+    Callers are often async handlers, so enqueue() never waits or touches
+    the database. When the queue is full, overflow_policy decides: "spill"
+    sets the row aside (up to spill_limit rows) for the writer to pick up
+    after its current batch; "drop" discards the row. Either way, rows that
+    don't fit are counted as dropped.
+    """
+    
+    def __init__(self, max_queue: int, batch_size: int, flush_interval_ms: float,
+                 overflow_policy: str = "spill", spill_limit: int = 100000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.overflow_policy = overflow_policy
+        self.spill_limit = spill_limit
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._spill: deque = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._in_flight = 0
+        
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed = 0
+        self.flushes = 0
+        self.largest_batch = 0
+        self.total_flush_seconds = 0.0
+    
+    def _ensure_started(self):
+        # Started lazily, and again in a forked child where the thread doesn't exist
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+    
+    def enqueue(self, row: Dict[str, Any], model=AuditLog):
+        self._ensure_started()
+        item = (model, row)
+        with self._idle:
+            self._in_flight += 1
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if self.overflow_policy == "spill" and len(self._spill) < self.spill_limit:
+                self._spill.append(item)
+                self.spilled += 1
+            else:
+                self._done(1)
+                self.dropped += 1
+                return
+        self.enqueued += 1
+    
+    def _done(self, count: int):
+        with self._idle:
+            self._in_flight -= count
+            if self._in_flight <= 0:
+                self._idle.notify_all()
+    
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is _STOP
+            items = [item for item in batch if item is not _STOP]
+            if items:
+                self._write(items)
+                self._done(len(items))
+            # Rows only spill while the queue is full, so this runs before the next get() could block
+            while self._spill:
+                spilled = [self._spill.popleft() for _ in range(min(self.batch_size, len(self._spill)))]
+                self._write(spilled)
+                self._done(len(spilled))
+            if stop:
+                return
+    
+    def _insert(self, db, items: List[tuple]):
+        by_model: Dict[Any, List[Dict[str, Any]]] = {}
+        for model, row in items:
+            by_model.setdefault(model, []).append(row)
+        for model, rows in by_model.items():
+            db.bulk_insert_mappings(model, rows)
+        db.commit()
+    
+    def _write(self, items: List[tuple]):
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            try:
+                self._insert(db, items)
+            except Exception as e:
+                # A process started before anything created this month's partition
+                if not audit_partitions.is_missing_partition_error(e):
+                    raise
+                db.rollback()
+                audit_partitions.ensure_partitions(engine, settings.AUDIT_PARTITION_MONTHS_AHEAD)
+                self._insert(db, items)
+            self.written += len(items)
+        except Exception as e:
+            db.rollback()
+            print(f"Audit logging failed for a batch of {len(items)}: {e}")
+            # Retry row by row so one bad row doesn't cost the whole batch
+            for model, row in items:
+                try:
+                    db.bulk_insert_mappings(model, [row])
+                    db.commit()
+                    self.written += 1
+                except Exception as row_error:
+                    db.rollback()
+                    self.failed += 1
+                    print(f"Audit logging failed: {row_error}")
+        finally:
+            db.close()
+        self.flushes += 1
+        self.largest_batch = max(self.largest_batch, len(items))
+        self.total_flush_seconds += time.perf_counter() - start
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued row has been written; returns False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight <= 0, timeout=timeout)
+    
+    def close(self, timeout: float = 10.0):
+        """Write out what is queued and stop the writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "spill_depth": len(self._spill),
+            "max_queue": self._queue.maxsize,
+            "overflow_policy": self.overflow_policy,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "largest_batch": self.largest_batch,
+            "avg_flush_ms": round(self.total_flush_seconds / self.flushes * 1000, 2) if self.flushes else 0.0
+        }
+
+
+audit_writer = AuditWriter(
+    max_queue=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval_ms=settings.AUDIT_FLUSH_INTERVAL_MS,
+    overflow_policy=settings.AUDIT_OVERFLOW_POLICY,
+    spill_limit=settings.AUDIT_SPILL_LIMIT
+)
+metrics.register("audit_writer", audit_writer.stats)
 
 class AuditLogger:
-    def __init__(self):
-        self.db = SessionLocal()
+    def __init__(self, writer: Optional[AuditWriter] = None):
+        self.writer = writer or audit_writer
     
     def log(self, 
             user_id: str, 
@@ -18,25 +202,54 @@ class AuditLogger:
             details: Optional[Dict[str, Any]] = None,
             request: Optional[Request] = None):
         """
-        Log an audit event
+        Log an audit event (queued; written by the background audit writer)
         """
-        try:
-            audit_log = AuditLog(
-                user_id=user_id,
-                action=action,
-                document_id=document_id,
-                details=details if details else {},
-                ip_address=self._get_client_ip(request) if request else None,
-                user_agent=self._get_user_agent(request) if request else None,
-                timestamp=datetime.utcnow()
-            )
-            
-            self.db.add(audit_log)
-            self.db.commit()
-            
-        except Exception as e:
-            self.db.rollback()
-            print(f"Audit logging failed: {e}")
+        self.writer.enqueue(self._row(user_id, action, document_id, details, request))
+    
+    def log_many(self, entries: List[Dict[str, Any]]):
+        """
+        Log several audit events at once. Each entry takes the same
+        keyword arguments as log().
+        """
+        for entry in entries:
+            self.log(**entry)
+    
+    def log_chat_message(self,
+                         user_id: str,
+                         query: str,
+                         response: Dict[str, Any],
+                         channel: str = "query"):
+        """Record a chat exchange for /chat/history (queued with the audit events)"""
+        self.writer.enqueue({
+            "user_id": user_id,
+            "query": query,
+            "intent": response.get("intent"),
+            "intent_similarity": response.get("intent_similarity"),
+            "confidence": float(response.get("confidence") or 0),
+            "source_ids": [
+                source["chunk_id"] for source in response.get("sources", []) if source.get("chunk_id")
+            ],
+            "response_length": len(response.get("answer", "")),
+            "channel": channel,
+            "timestamp": datetime.utcnow()
+        }, model=ChatMessage)
+    
+    def _row(self,
+             user_id: str,
+             action: str,
+             document_id: Optional[int],
+             details: Optional[Dict[str, Any]],
+             request: Optional[Request]) -> Dict[str, Any]:
+        # Everything is read from the request now; it is gone by the time the row is written
+        return {
+            "user_id": user_id,
+            "action": action,
+            "document_id": document_id,
+            "details": details if details else {},
+            "ip_address": self._get_client_ip(request) if request else None,
+            "user_agent": self._get_user_agent(request) if request else None,
+            "timestamp": datetime.utcnow()
+        }
     
     def _get_client_ip(self, request: Request) -> Optional[str]:
         """Extract client IP address"""
@@ -70,19 +283,23 @@ class AuditLogger:
         """
         Retrieve audit logs with filters
         """
-        query = self.db.query(AuditLog)
-        
-        if user_id:
-            query = query.filter(AuditLog.user_id == user_id)
-        if action:
-            query = query.filter(AuditLog.action == action)
-        if start_date:
-            query = query.filter(AuditLog.timestamp >= start_date)
-        if end_date:
-            query = query.filter(AuditLog.timestamp <= end_date)
-        
-        return query.order_by(AuditLog.timestamp.desc()).limit(limit).all()
+        db = SessionLocal()
+        try:
+            query = db.query(AuditLog)
+            
+            if user_id:
+                query = query.filter(AuditLog.user_id == user_id)
+            if action:
+                query = query.filter(AuditLog.action == action)
+            if start_date:
+                query = query.filter(AuditLog.timestamp >= start_date)
+            if end_date:
+                query = query.filter(AuditLog.timestamp <= end_date)
+            
+            return query.order_by(AuditLog.timestamp.desc()).limit(limit).all()
+        finally:
+            db.close()
     
     def close(self):
-        """Close database connection"""
-        self.db.close()
\ No newline at end of file
+        """Write out queued events (the writer thread is shared, so it keeps running)"""
+        self.writer.flush(timeout=10.0)
\ No newline at end of file
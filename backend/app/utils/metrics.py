@@ -0,0 +1,20 @@
+from typing import Any, Callable, Dict
+
+# Components register a callable returning their current counters
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register(name: str, provider: Callable[[], Dict[str, Any]]):
+    """Register a stats provider under name (re-registering replaces it)"""
+    _providers[name] = provider
+
+
+def snapshot() -> Dict[str, Any]:
+    """Collect the current stats from every registered provider"""
+    result = {}
+    for name, provider in list(_providers.items()):
+        try:
+            result[name] = provider()
+        except Exception as e:
+            result[name] = {"error": str(e)}
+    return result
@@ -0,0 +1,49 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    payload = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything it didn't produce"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+async def keyset_page(db: AsyncSession, statement, timestamp_column, id_column,
+                      cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Newest-first page of a select() statement after cursor, ordered by (timestamp, id) desc.
+    Returns the rows and the cursor for the next page (None on the last page).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        after_timestamp, after_id = decode_cursor(cursor)
+        statement = statement.where(
+            # The plain bound lets PostgreSQL prune partitions; the row comparison does the paging
+            timestamp_column <= after_timestamp,
+            tuple_(timestamp_column, id_column) < tuple_(after_timestamp, after_id)
+        )
+
+    statement = statement.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1)
+    rows = (await db.execute(statement)).scalars().all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
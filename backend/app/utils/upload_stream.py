@@ -0,0 +1,179 @@
+"""
+Stream a multipart file upload from the request body straight to disk.
+
+The body is parsed as it arrives rather than spooled by the form parser
+first, so every byte is written once. The SHA-256 is computed on the way,
+the size limit is enforced per chunk (the upload is abandoned as soon as
+it is exceeded) and the file signature is checked from the first bytes.
+"""
+import hashlib
+import os
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import anyio
+from fastapi import Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.utils.validators import validate_file
+
+# Leading bytes every file of the type starts with (plain text has none)
+FILE_SIGNATURES = {
+    ".pdf": b"%PDF-",
+    ".docx": b"PK\x03\x04",
+}
+
+# Allowance for the boundaries and part headers around the file in Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """The upload failed validation; status_code is the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+class StreamedUpload:
+    def __init__(self, filename: str, path: str, size: int, content_hash: str):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.content_hash = content_hash
+
+
+class _FilePartCollector:
+    """python-multipart callbacks that collect the data of the first file part named field_name"""
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.pending: List[bytes] = []
+        self._in_file = False
+        self._disposition = b""
+        self._header_name = b""
+        self._header_value = b""
+
+    def callbacks(self) -> Dict[str, Callable]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self):
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if self.filename is None and name == self.field_name and b"filename" in options:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self._in_file = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        # Callbacks can't await, so the data is written out after each parser.write()
+        if self._in_file:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self):
+        self._in_file = False
+
+
+def _too_large(max_size: int) -> UploadRejected:
+    return UploadRejected(413, f"File too large. Maximum size is {max_size/(1024*1024):.1f}MB")
+
+
+async def stream_upload(request: Request, upload_dir: str, max_size: int, allowed_extensions: list,
+                        chunk_size: int, field_name: str = "file") -> StreamedUpload:
+    """
+    Write the multipart file field field_name to a temporary file in
+    upload_dir. Raises UploadRejected (and removes the partial file) if the
+    body is malformed, the name or type isn't allowed, or it exceeds max_size.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected(400, "Expected a multipart/form-data upload")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise _too_large(max_size)
+
+    collector = _FilePartCollector(field_name)
+    parser = MultipartParser(params[b"boundary"], collector.callbacks())
+    path = os.path.join(upload_dir, f"{uuid.uuid4()}.upload")
+    sha256 = hashlib.sha256()
+    size = 0
+    head = b""
+    signature = b""
+    buffer = bytearray()
+    out = None
+
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError:
+                raise UploadRejected(400, "Malformed multipart body")
+
+            if out is None and collector.filename is not None:
+                validation_result = validate_file(collector.filename, allowed_extensions)
+                if not validation_result["valid"]:
+                    raise UploadRejected(400, validation_result["message"])
+                signature = FILE_SIGNATURES.get(os.path.splitext(collector.filename)[1].lower(), b"")
+                out = await anyio.open_file(path, "wb")
+
+            for data in collector.pending:
+                size += len(data)
+                if size > max_size:
+                    raise _too_large(max_size)
+                if len(head) < len(signature):
+                    head += data[:len(signature) - len(head)]
+                    if not signature.startswith(head):
+                        raise UploadRejected(400, "File content does not match its extension")
+                sha256.update(data)
+                buffer += data
+            collector.pending.clear()
+
+            # Batch disk writes so large uploads don't make one thread hop per network read
+            if len(buffer) >= chunk_size:
+                await out.write(bytes(buffer))
+                buffer.clear()
+
+        try:
+            parser.finalize()
+        except MultipartParseError:
+            raise UploadRejected(400, "Malformed multipart body")
+        if out is None:
+            raise UploadRejected(400, f"No file uploaded in the '{field_name}' field")
+        if head != signature:
+            raise UploadRejected(400, "File content does not match its extension")
+        if buffer:
+            await out.write(bytes(buffer))
+        await out.aclose()
+    except BaseException:
+        if out is not None:
+            await out.aclose()
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    return StreamedUpload(collector.filename, path, size, sha256.hexdigest())
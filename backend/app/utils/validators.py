@@ -1,25 +1,14 @@
 import os
 import re
 from typing import Dict, Any
-from fastapi import UploadFile
 
-def validate_file(file: UploadFile, max_size: int, allowed_extensions: list) -> Dict[str, Any]:
+def validate_file(filename: str, allowed_extensions: list) -> Dict[str, Any]:
     """
-    Validate uploaded file
+    Validate an uploaded file's name. Size and content are checked while the
+    upload streams to disk (app.utils.upload_stream).
     """
-    # Check file size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to beginning
-    
-    if file_size > max_size:
-        return {
-            "valid": False,
-            "message": f"File too large. Maximum size is {max_size/(1024*1024):.1f}MB"
-        }
-    
     # Check extension
-    file_extension = os.path.splitext(file.filename)[1].lower()
+    file_extension = os.path.splitext(filename)[1].lower()
     if file_extension not in allowed_extensions:
         return {
             "valid": False,
@@ -27,7 +16,7 @@ def validate_file(file: UploadFile, max_size: int, allowed_extensions: list) ->
         }
     
     # Check filename for security
-    if not re.match(r'^[\w\-. ]+$', file.filename):
+    if not re.match(r'^[\w\-. ]+$', filename):
         return {
             "valid": False,
             "message": "Invalid filename"
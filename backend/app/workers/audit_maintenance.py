@@ -0,0 +1,93 @@
+"""
+Audit log partition maintenance.
+
+Run alongside the API (e.g. as its own container):
+
+    python -m app.workers.audit_maintenance
+
+Every AUDIT_MAINTENANCE_INTERVAL_SECONDS it creates the monthly audit_logs
+partitions AUDIT_PARTITION_MONTHS_AHEAD months ahead and detaches those
+older than AUDIT_RETENTION_MONTHS (dropping them too if AUDIT_RETENTION_DROP
+is set). Chat history in chat_messages has its own retention,
+CHAT_HISTORY_RETENTION_DAYS. --once runs a single pass; --migrate converts
+an existing unpartitioned audit_logs table first.
+"""
+import argparse
+import signal
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete
+
+from app.config import settings
+
+_stopping = False
+
+
+def _request_stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+
+def run_once(engine):
+    from app.database import audit_partitions
+
+    created = audit_partitions.ensure_partitions(engine, settings.AUDIT_PARTITION_MONTHS_AHEAD)
+    detached = audit_partitions.detach_expired_partitions(
+        engine, settings.AUDIT_RETENTION_MONTHS, drop=settings.AUDIT_RETENTION_DROP
+    )
+    print(f"Audit partitions created: {created or 'none'}; "
+          f"{'dropped' if settings.AUDIT_RETENTION_DROP else 'detached'}: {detached or 'none'}")
+
+    if settings.CHAT_HISTORY_RETENTION_DAYS > 0:
+        purged = purge_chat_history(engine, settings.CHAT_HISTORY_RETENTION_DAYS)
+        print(f"Purged {purged} chat messages older than {settings.CHAT_HISTORY_RETENTION_DAYS} days")
+
+
+def purge_chat_history(engine, retention_days: int) -> int:
+    from app.models.document import ChatMessage
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    with engine.begin() as conn:
+        result = conn.execute(delete(ChatMessage).where(ChatMessage.timestamp < cutoff))
+    return result.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain monthly audit_logs partitions")
+    parser.add_argument("--once", action="store_true", help="run one maintenance pass and exit")
+    parser.add_argument("--migrate", action="store_true",
+                        help="convert an existing unpartitioned audit_logs table first")
+    args = parser.parse_args()
+
+    from app.database.session import engine, Base
+    from app.database import audit_partitions
+    import app.models.document  # noqa: F401 (registers the tables)
+
+    Base.metadata.create_all(bind=engine)
+    if args.migrate:
+        if audit_partitions.migrate_to_partitioned(engine, settings.AUDIT_PARTITION_MONTHS_AHEAD):
+            print(f"Migrated audit_logs; the old rows remain in {audit_partitions.LEGACY_TABLE}")
+        else:
+            print("audit_logs is already partitioned (or not on PostgreSQL); nothing to migrate")
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    while True:
+        try:
+            run_once(engine)
+        except Exception as e:
+            print(f"Audit maintenance failed: {e}")
+        if args.once:
+            break
+
+        next_run = time.monotonic() + settings.AUDIT_MAINTENANCE_INTERVAL_SECONDS
+        while not _stopping and time.monotonic() < next_run:
+            time.sleep(1)
+        if _stopping:
+            break
+
+
+if __name__ == "__main__":
+    main()
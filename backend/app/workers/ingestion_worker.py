@@ -0,0 +1,107 @@
+"""
+Ingestion worker pool.
+
+Run alongside the API (e.g. as its own container):
+
+    python -m app.workers.ingestion_worker --concurrency 4
+
+Each worker is a separate process that claims jobs from the ingestion_jobs
+table, so PDF extraction and embedding never run inside the web process and
+queued work survives restarts and redeploys.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from app.config import settings
+
+_stopping = False
+
+
+def _request_stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+
+def worker_loop(worker_number: int):
+    """Claim and run jobs until asked to stop"""
+    from app.database.session import SessionLocal
+    from app.services.ingestion import (
+        claim_next_job, run_job, build_vector_index_if_due, refresh_lexical_index_if_due
+    )
+    from app.utils.audit_logger import AuditLogger
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{worker_number}"
+    audit_logger = AuditLogger()
+    print(f"Ingestion worker {worker_id} started")
+
+    while not _stopping:
+        db = SessionLocal()
+        try:
+            job = claim_next_job(db, worker_id)
+            if job is None:
+                db.close()
+                # Picks up rebuilds requested through the admin API
+                build_vector_index_if_due()
+                # Changes from a burst of jobs are indexed for BM25 in one go once the queue is empty
+                if not refresh_lexical_index_if_due(idle=True):
+                    time.sleep(settings.INGESTION_POLL_INTERVAL_SECONDS)
+                continue
+
+            print(f"[{worker_id}] Processing job {job.id} (document {job.document_id}, attempt {job.attempts})")
+            run_job(db, job, audit_logger)
+            refresh_lexical_index_if_due(idle=False)
+        except Exception as e:
+            db.rollback()
+            print(f"[{worker_id}] Ingestion worker error: {e}")
+            time.sleep(settings.INGESTION_POLL_INTERVAL_SECONDS)
+        finally:
+            db.close()
+
+    audit_logger.close()
+    print(f"Ingestion worker {worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the document ingestion worker pool")
+    parser.add_argument("--concurrency", type=int, default=settings.INGESTION_WORKERS,
+                        help="number of worker processes")
+    args = parser.parse_args()
+    # Spawned workers read settings afresh; they size their PDF extraction pools from this
+    os.environ["INGESTION_WORKERS"] = str(args.concurrency)
+
+    from app.database import audit_partitions
+    from app.database.session import engine
+
+    # Workers write audit rows, which need this month's partition even if the API hasn't started
+    audit_partitions.ensure_partitions(engine, settings.AUDIT_PARTITION_MONTHS_AHEAD)
+
+    # Spawn so each worker gets its own DB engine and embedding model
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=worker_loop, args=(i,), name=f"ingestion-worker-{i}")
+        for i in range(args.concurrency)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward_stop(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, forward_stop)
+    signal.signal(signal.SIGINT, forward_stop)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark: section/keyword extraction throughput, before and after.
+
+Run from backend/: python -m benchmarks.section_extractor_benchmark [--lines N]
+"""
+import argparse
+import random
+import re
+import time
+
+from app.services.section_extractor import SectionExtractor
+
+KEYWORDS = [
+    'hacking', 'phishing', 'malware', 'data breach', 'encryption',
+    'digital signature', 'electronic record', 'cyber terrorism',
+    'identity theft', 'privacy', 'certifying authority', 'intermediary',
+    'computer resource', 'network service', 'electronic governance'
+]
+
+HEADERS = [
+    "SECTION {n}A: Compensation for failure to protect data breach",
+    "Information Technology Act, 2000",
+    "Cyber Security obligations of an intermediary",
+    "{n}. Penalty for damage to computer resource",
+    "Section {n} - Punishment for identity theft and phishing",
+]
+
+BODY = [
+    "Whoever, with the intent to cause wrongful loss or damage to the public or any person,",
+    "destroys or deletes or alters any information residing in a computer resource or diminishes",
+    "its value or utility or affects it injuriously by any means, commits hacking and shall be",
+    "punished with imprisonment for a term which may extend to three years, or with fine which",
+    "may extend up to two lakh rupees, or with both. Explanation: for the purposes of this",
+    "provision, the expression electronic record shall have the meaning assigned to it under",
+]
+
+
+# The extractor as it was: four uncompiled searches per line and a substring scan per keyword
+def legacy_extract_keywords(text):
+    found_keywords = []
+    text_lower = text.lower()
+    for keyword in KEYWORDS:
+        if keyword in text_lower:
+            found_keywords.append(keyword)
+    return found_keywords
+
+
+def legacy_iter_sections(lines):
+    patterns = [
+        r'(IT\s+Act,\s*2000|Information\s+Technology\s+Act,\s*2000)',
+        r'SECTION\s+\d+[A-Z]*\s*[:\.]?\s*(.+)',
+        r'(Cyber\s+Crime|Cyber\s+Security|Data\s+Protection|Digital\s+Signature)',
+        r'^\s*(\d+[\.\)])\s+(.+)$',
+    ]
+    current_section = None
+    content_parts = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        for pattern in patterns:
+            if re.search(pattern, line, re.IGNORECASE):
+                if current_section:
+                    current_section['content'] = ''.join(content_parts)
+                    yield current_section
+                current_section = {
+                    'title': line,
+                    'content': '',
+                    'type': 'section',
+                    'keywords': legacy_extract_keywords(line)
+                }
+                content_parts = []
+                break
+        else:
+            if current_section:
+                content_parts.append(line + ' ')
+    if current_section:
+        current_section['content'] = ''.join(content_parts)
+        yield current_section
+
+
+def make_lines(count, header_every=25, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        if i % header_every == 0:
+            lines.append(rng.choice(HEADERS).format(n=rng.randint(1, 90)))
+        else:
+            lines.append(rng.choice(BODY))
+    return lines
+
+
+def measure(name, iter_sections, lines, repeat):
+    best = float("inf")
+    sections = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sections = list(iter_sections(lines))
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:>8}: {len(lines) / best:>12,.0f} lines/s  ({len(sections)} sections)")
+    return sections, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines)
+    extractor = SectionExtractor(KEYWORDS)
+
+    before, before_seconds = measure("before", legacy_iter_sections, lines, args.repeat)
+    after, after_seconds = measure("after", extractor.iter_sections, lines, args.repeat)
+
+    assert before == after, "extractors disagree"
+    print(f" speedup: {before_seconds / after_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from app.utils.audit_logger import AuditWriter
+
+
+@pytest.fixture
+def blocked_writer():
+    """An AuditWriter whose database write blocks until released, recording what it wrote"""
+    writers = []
+
+    def make(overflow_policy: str, spill_limit: int = 1) -> AuditWriter:
+        writer = AuditWriter(max_queue=1, batch_size=1, flush_interval_ms=0,
+                             overflow_policy=overflow_policy, spill_limit=spill_limit)
+        writer.entered = threading.Event()
+        writer.release = threading.Event()
+        writer.rows = []
+
+        def write(items):
+            writer.entered.set()
+            assert writer.release.wait(5)
+            writer.rows.extend(row["n"] for _, row in items)
+            writer.written += len(items)
+
+        writer._write = write
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.release.set()
+        writer.close()
+
+
+def fill(writer: AuditWriter, count: int):
+    writer.enqueue({"n": 0})
+    # Row 0 is in the writer's hands, so the queue (size 1) is empty again
+    assert writer.entered.wait(5)
+    for n in range(1, count):
+        writer.enqueue({"n": n})
+
+
+def test_spill_policy_keeps_overflow_rows_up_to_the_limit(blocked_writer):
+    writer = blocked_writer("spill", spill_limit=1)
+    fill(writer, 4)
+
+    # 1 waits in the queue, 2 spills, 3 finds both full
+    assert (writer.spilled, writer.dropped) == (1, 1)
+    writer.release.set()
+    assert writer.flush(timeout=5)
+    assert sorted(writer.rows) == [0, 1, 2]
+    assert writer.stats()["written"] == 3
+
+
+def test_drop_policy_discards_overflow_rows(blocked_writer):
+    writer = blocked_writer("drop")
+    fill(writer, 4)
+
+    assert (writer.spilled, writer.dropped) == (0, 2)
+    writer.release.set()
+    assert writer.flush(timeout=5)
+    assert sorted(writer.rows) == [0, 1]
+
+
+def test_enqueue_never_blocks_on_a_stuck_writer(blocked_writer):
+    writer = blocked_writer("spill", spill_limit=100)
+    done = threading.Event()
+
+    def log_many():
+        fill(writer, 50)
+        done.set()
+
+    threading.Thread(target=log_many, daemon=True).start()
+    assert done.wait(2)
+    assert writer.spilled == 48 and writer.dropped == 0
@@ -0,0 +1,38 @@
+from app.services.cache import LRUCache, VersionedCache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  What is   Section 66?  ") == "what is section 66"
+    assert normalize_query("What is\tsection 66 ?!.") == "what is section 66"
+    assert normalize_query("What is section 66") == normalize_query("what is SECTION 66?")
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_versioned_cache_drops_entries_from_older_versions():
+    cache = VersionedCache(max_size=10)
+    assert cache.get_versioned("q", "v1") is None
+    cache.set_versioned("q", "v1", "answer")
+    assert cache.get_versioned("q", "v1") == "answer"
+
+    assert cache.get_versioned("q", "v2") is None
+    assert cache.invalidations == 1
+    assert len(cache) == 0
+
+
+def test_versioned_cache_ignores_results_computed_against_an_old_version():
+    cache = VersionedCache(max_size=10)
+    cache.get_versioned("q", "v1")
+    cache.get_versioned("q", "v2")
+    # A query that started under v1 finishes after the corpus moved on
+    cache.set_versioned("q", "v1", "stale")
+    assert cache.get_versioned("q", "v2") is None
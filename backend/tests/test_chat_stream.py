@@ -0,0 +1,89 @@
+import asyncio
+import importlib
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.inference_executor import InferenceExecutor
+from app.services.rag_service import HybridRAGService, QueryCancelled
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    # The module builds its RAG service at import; these tests swap it out anyway
+    monkeypatch.setattr(HybridRAGService, "__init__", lambda self, config: None)
+    return importlib.import_module("app.routes.chat")
+
+
+def test_disconnect_cancels_running_query(chat, monkeypatch):
+    started = threading.Event()
+    seen = {}
+
+    class BlockingRag:
+        def query(self, query, cancelled):
+            seen["cancelled"] = cancelled
+            started.set()
+            if cancelled.wait(5):
+                raise QueryCancelled()
+            return {"answer": "too late"}
+
+    executor = InferenceExecutor(max_workers=1, max_queue=1, name="test-inference")
+    monkeypatch.setattr(chat, "rag_service", BlockingRag())
+    monkeypatch.setattr(chat, "inference_executor", executor)
+
+    async def disconnect_mid_query():
+        response = await chat.stream_chatbot({"query": "What is section 66?"},
+                                             current_user=SimpleNamespace(username="tester"))
+        body = response.body_iterator
+        assert await body.__anext__() == ": connected\n\n"
+
+        consumer = asyncio.ensure_future(body.__anext__())
+        # Only disconnect once the query is running, not while it is still queued
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consumer
+
+    try:
+        asyncio.run(disconnect_mid_query())
+        assert seen["cancelled"].is_set()
+    finally:
+        executor.shutdown()
+
+
+def test_batch_streams_answers_and_stops_on_disconnect(chat, monkeypatch):
+    submitted_slices = []
+    seen = {}
+
+    class SlowRag:
+        def query_batch(self, queries, cancelled=None):
+            submitted_slices.append(list(queries))
+            seen["cancelled"] = cancelled
+            for position, query in enumerate(queries):
+                if cancelled.wait(0.01):
+                    raise QueryCancelled()
+                yield position, {"answer": query.upper(), "intent": "general"}
+
+    executor = InferenceExecutor(max_workers=1, max_queue=4, name="test-inference")
+    monkeypatch.setattr(chat, "rag_service", SlowRag())
+    monkeypatch.setattr(chat, "inference_executor", executor)
+    monkeypatch.setattr(chat.settings, "BATCH_QUERY_CHUNK_SIZE", 3)
+    monkeypatch.setattr(chat.audit_logger, "log_chat_message", lambda *args, **kwargs: None)
+    monkeypatch.setattr(chat.audit_logger, "log_many", lambda entries: None)
+
+    async def read_one_line_then_disconnect():
+        response = await chat.batch_query_chatbot({"queries": ["a", "b", "c", "d", "e", "f"]},
+                                                  current_user=SimpleNamespace(username="tester"))
+        body = response.body_iterator
+        first = await body.__anext__()
+        await body.aclose()
+        return first
+
+    try:
+        first = asyncio.run(read_one_line_then_disconnect())
+        assert '"index": 0' in first and '"A"' in first
+        assert seen["cancelled"].is_set()
+        assert submitted_slices == [["a", "b", "c"]]
+    finally:
+        executor.shutdown()
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 3, 1, 12, 30, 5, 123456, tzinfo=timezone.utc)
+    cursor = encode_cursor(timestamp, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, 42)
+
+
+def test_cursor_round_trip_naive_timestamp():
+    timestamp = datetime(2024, 3, 1, 12, 30)
+    assert decode_cursor(encode_cursor(timestamp, 1)) == (timestamp, 1)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "W10", encode_cursor(datetime(2024, 1, 1), 1)[:-3]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
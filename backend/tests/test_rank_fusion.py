@@ -0,0 +1,31 @@
+import pytest
+
+from app.services.rag_service import reciprocal_rank_fusion
+
+
+def test_hits_in_both_lists_rank_first():
+    vector = [{"id": "a", "_distance": 0.1}, {"id": "b", "_distance": 0.2}]
+    lexical = [{"id": "b", "score": 9.0}, {"id": "c", "score": 5.0}]
+    fused = reciprocal_rank_fusion([vector, lexical], k=60)
+
+    assert [hit["id"] for hit, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1][1] == pytest.approx(1 / 61)
+
+
+def test_first_list_supplies_the_row_for_shared_hits():
+    vector = [{"id": "a", "_distance": 0.1}]
+    lexical = [{"id": "a", "score": 3.0}]
+    (hit, _), = reciprocal_rank_fusion([vector, lexical])
+    assert hit == {"id": "a", "_distance": 0.1}
+
+
+def test_k_damps_the_lead_of_the_top_rank():
+    ranked = [{"id": "a"}, {"id": "b"}]
+    (_, first), (_, second) = reciprocal_rank_fusion([ranked], k=0)
+    assert first / second == pytest.approx(2.0)
+
+
+def test_empty_lists():
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
@@ -0,0 +1,36 @@
+from app.services.section_extractor import KeywordMatcher, SectionExtractor
+from benchmarks.section_extractor_benchmark import KEYWORDS, legacy_iter_sections, make_lines
+
+
+def test_keyword_matcher_finds_overlapping_and_prefix_keywords():
+    matcher = KeywordMatcher(["data", "data breach", "breach", "hacking"])
+    # 'data breach' is the longest match at its position; 'data' and 'breach' match inside it
+    assert matcher.find("A DATA BREACH notice") == ["data", "data breach", "breach"]
+
+
+def test_keyword_matcher_reports_dictionary_order_once_per_keyword():
+    matcher = KeywordMatcher(["phishing", "hacking", "Hacking", ""])
+    assert matcher.keywords == ["phishing", "hacking"]
+    assert matcher.find("hacking, then phishing, then hacking again") == ["phishing", "hacking"]
+
+
+def test_keyword_matcher_matches_substrings_like_the_old_scan():
+    matcher = KeywordMatcher(["privacy"])
+    assert matcher.find("privacy-preserving") == ["privacy"]
+    assert matcher.find("nothing relevant") == []
+
+
+def test_keyword_matcher_escapes_regex_characters():
+    matcher = KeywordMatcher(["s. 66(a)", "e.g"])
+    assert matcher.find("under S. 66(A) of the act") == ["s. 66(a)"]
+    assert matcher.find("egg") == []
+
+
+def test_empty_keyword_matcher_finds_nothing():
+    assert KeywordMatcher([]).find("hacking") == []
+
+
+def test_extractor_matches_the_legacy_extractor():
+    # The equivalence check the benchmark asserts, on a smaller input
+    lines = make_lines(5000, seed=7)
+    assert list(SectionExtractor(KEYWORDS).iter_sections(lines)) == list(legacy_iter_sections(lines))
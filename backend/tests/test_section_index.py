@@ -0,0 +1,34 @@
+import pytest
+
+from app.services.section_index import normalize_act, parse_section_header, parse_section_reference
+
+
+@pytest.mark.parametrize("text, act", [
+    ("Information Technology Act, 2000", "it act"),
+    ("What is Section 43A of the IT Act?", "it act"),
+    ("penalty under the Companies Act", "companies act"),
+    ("Section 5 of this Act", ""),
+    ("as defined in the said Act", ""),
+    ("the Act", ""),
+    ("Section 66", ""),
+    ("", ""),
+    (None, ""),
+])
+def test_normalize_act(text, act):
+    assert normalize_act(text) == act
+
+
+@pytest.mark.parametrize("query, reference", [
+    ("What is Section 43A of the IT Act?", ("it act", "43a")),
+    ("explain sec. 66 of the Information Technology Act", ("it act", "66")),
+    ("s. 72 of this act", ("", "72")),
+    ("What does section 66E say?", ("", "66e")),
+    ("What is hacking?", None),
+])
+def test_parse_section_reference(query, reference):
+    assert parse_section_reference(query) == reference
+
+
+def test_parse_section_header():
+    assert parse_section_header("SECTION 43A: Compensation for failure to protect data") == "43a"
+    assert parse_section_header("Cyber Security obligations") is None
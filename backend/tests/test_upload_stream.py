@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from starlette.requests import Request
+
+from app.utils.upload_stream import UploadRejected, stream_upload
+
+BOUNDARY = b"XyZ"
+ALLOWED = [".pdf", ".txt", ".docx"]
+
+
+def multipart_body(filename: str, content: bytes, field_name: str = "file") -> bytes:
+    return (
+        b"--" + BOUNDARY + b"\r\n"
+        b'Content-Disposition: form-data; name="' + field_name.encode() + b'"; filename="' + filename.encode() + b'"\r\n'
+        b"Content-Type: application/octet-stream\r\n\r\n"
+        + content + b"\r\n"
+        b"--" + BOUNDARY + b"--\r\n"
+    )
+
+
+def make_request(body: bytes, piece: int = 7, content_type: bytes = b"multipart/form-data; boundary=XyZ",
+                 content_length: bool = True) -> Request:
+    headers = [(b"content-type", content_type)]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    pieces = [body[i:i + piece] for i in range(0, len(body), piece)] or [b""]
+
+    async def receive():
+        data = pieces.pop(0)
+        return {"type": "http.request", "body": data, "more_body": bool(pieces)}
+
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+
+def upload(tmp_path, request: Request, max_size: int = 1024, chunk_size: int = 16):
+    return asyncio.run(stream_upload(request, str(tmp_path), max_size, ALLOWED, chunk_size))
+
+
+def test_streams_file_to_disk_with_hash(tmp_path):
+    content = b"%PDF-1.7\n" + b"x" * 300
+    result = upload(tmp_path, make_request(multipart_body("act.pdf", content)))
+
+    assert result.filename == "act.pdf"
+    assert result.size == len(content)
+    assert result.content_hash == hashlib.sha256(content).hexdigest()
+    with open(result.path, "rb") as f:
+        assert f.read() == content
+
+
+def test_rejects_oversized_file_and_removes_partial_file(tmp_path):
+    body = multipart_body("big.txt", b"a" * 2000)
+    # Without Content-Length the limit is enforced while streaming
+    with pytest.raises(UploadRejected) as error:
+        upload(tmp_path, make_request(body, content_length=False), max_size=1000)
+    assert error.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_rejects_declared_length_over_limit_before_reading(tmp_path):
+    body = multipart_body("big.txt", b"a" * 200)
+    request = make_request(body)
+    request.scope["headers"][1] = (b"content-length", str(10 ** 9).encode())
+    with pytest.raises(UploadRejected) as error:
+        upload(tmp_path, request, max_size=1000)
+    assert error.value.status_code == 413
+
+
+@pytest.mark.parametrize("filename, content", [
+    ("fake.pdf", b"MZ\x90\x00 not a pdf at all"),
+    ("fake.docx", b"%PDF-1.4 not a zip"),
+    ("short.pdf", b"%PD"),
+])
+def test_rejects_content_not_matching_extension(tmp_path, filename, content):
+    with pytest.raises(UploadRejected) as error:
+        upload(tmp_path, make_request(multipart_body(filename, content), piece=2))
+    assert error.value.status_code == 400
+    assert "does not match" in error.value.message
+    assert os.listdir(tmp_path) == []
+
+
+def test_plain_text_has_no_signature(tmp_path):
+    result = upload(tmp_path, make_request(multipart_body("notes.txt", b"Section 66")))
+    assert result.size == len(b"Section 66")
+
+
+def test_rejects_disallowed_extension(tmp_path):
+    with pytest.raises(UploadRejected) as error:
+        upload(tmp_path, make_request(multipart_body("run.exe", b"MZ")))
+    assert error.value.status_code == 400
+
+
+def test_rejects_missing_file_field_and_non_multipart(tmp_path):
+    with pytest.raises(UploadRejected, match="No file uploaded"):
+        upload(tmp_path, make_request(multipart_body("act.pdf", b"%PDF-1.7", field_name="other")))
+    with pytest.raises(UploadRejected, match="multipart/form-data"):
+        upload(tmp_path, make_request(b"{}", content_type=b"application/json"))